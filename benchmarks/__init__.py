@@ -0,0 +1 @@
+# Benchmarks do sistema de escalas: python -m benchmarks --help
@@ -0,0 +1,115 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from . import dados, medir
+
+# python -m benchmarks --funcionarios 50 500 5000 --anos 1 5
+# Gera (uma vez) os bancos sintéticos em --dados, mede cada operação num
+# processo novo e grava tudo em --saida para comparar entre versões.
+
+def _em_processo_novo(funcao, *args):
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+        return pool.submit(funcao, *args).result()
+
+def _versao():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _chave(r):
+    return (r["funcionarios"], r["anos"], r["taxa_trocas"], r["operacao"])
+
+def comparar(anteriores, atuais, tolerancia):
+    # devolve as linhas que ficaram mais lentas que a tolerância
+    antes = {_chave(r): r for r in anteriores}
+    regressoes = []
+    print(f"\n{'caso':<48} {'antes':>9} {'agora':>9} {'razão':>7}")
+    for r in atuais:
+        a = antes.get(_chave(r))
+        if not a:
+            continue
+        # abaixo de 10 ms o ruído domina a razão
+        razao = max(r["segundos"], 0.01) / max(a["segundos"], 0.01)
+        caso = f"{r['funcionarios']}f {r['anos']}a {r['operacao']}"
+        marca = " <-- regressão" if razao > tolerancia else ""
+        print(f"{caso:<48} {a['segundos']:>9.3f} {r['segundos']:>9.3f} {razao:>7.2f}{marca}")
+        if razao > tolerancia:
+            regressoes.append(r)
+    return regressoes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Mede as operações do sistema de escalas em bancos sintéticos.")
+    parser.add_argument("--funcionarios", type=int, nargs="+", default=[50, 500],
+                        help="tamanhos do quadro (padrão: 50 500)")
+    parser.add_argument("--anos", type=int, nargs="+", default=[1],
+                        help="anos de escala em cada banco (padrão: 1)")
+    parser.add_argument("--taxa-trocas", type=float, default=0.01,
+                        help="fração dos plantões 12x36 com troca (padrão: 0.01)")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--operacoes", nargs="+", choices=list(medir.OPERACOES),
+                        default=list(medir.OPERACOES))
+    parser.add_argument("--dados", default="bench_dados",
+                        help="pasta dos bancos gerados, reaproveitados entre execuções")
+    parser.add_argument("--saida", default="bench_resultados.json")
+    parser.add_argument("--comparar", metavar="ANTERIOR.json",
+                        help="resultado de outra versão; sai com erro se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=1.25,
+                        help="razão de tempo aceita na comparação (padrão: 1.25)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.dados, exist_ok=True)
+    resultados = []
+    for funcionarios in args.funcionarios:
+        for anos in args.anos:
+            banco = os.path.join(args.dados, dados.nome_arquivo(
+                funcionarios, anos, args.taxa_trocas, args.semente))
+            if not os.path.exists(banco):
+                print(f"gerando {banco}...", flush=True)
+                _em_processo_novo(dados.gerar_banco, banco, funcionarios, anos,
+                                  args.taxa_trocas, args.semente)
+            conn = sqlite3.connect(banco)
+            linhas = conn.execute("SELECT COUNT(*) FROM escalas").fetchone()[0]
+            trocas = conn.execute("SELECT COUNT(*) FROM trocas").fetchone()[0]
+            conn.close()
+            for operacao in args.operacoes:
+                r = _em_processo_novo(medir.executar, operacao, banco)
+                r.update(funcionarios=funcionarios, anos=anos, taxa_trocas=args.taxa_trocas,
+                         linhas_escalas=linhas, trocas=trocas)
+                resultados.append(r)
+                print(f"{funcionarios:>6}f {anos}a {operacao:<24} {r['segundos']:>9.3f}s "
+                      f"{r['consultas']:>8} consultas  pico {r['pico_rss_kb']} KB", flush=True)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump({
+            "versao": _versao(),
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "resultados": resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"resultados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anteriores = json.load(f)["resultados"]
+        if comparar(anteriores, resultados, args.tolerancia):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
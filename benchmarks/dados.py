@@ -0,0 +1,71 @@
+import os
+import random
+from datetime import date
+
+from escalas import db
+from escalas.datas import intervalo_mes
+from escalas.escala import gerar_escalas, listar_para_escala
+from escalas.trocas import registrar_trocas
+
+# Bancos sintéticos: 80% de plantonistas 12x36 (metade pares, metade
+# ímpares, diurno ou noturno) e 20% de estagiários de 6h. As trocas são
+# sorteadas a cada dia entre quem trabalha e um colega do mesmo turno
+# que está de folga, na proporção de taxa_trocas dos plantões.
+ANO_INICIAL = 2024
+
+def nome_arquivo(funcionarios, anos, taxa_trocas, semente):
+    return f"escalas_{funcionarios}f_{anos}a_{taxa_trocas:g}t_{semente}s.db"
+
+def _funcionarios(n, rnd):
+    linhas = []
+    for i in range(1, n + 1):
+        if rnd.random() < 0.8:
+            linhas.append((f"Funcionário {i:05d}", "12x36", rnd.choice(["pares", "ímpares"]),
+                           rnd.choice(["12h", "12h noturno"])))
+        else:
+            linhas.append((f"Estagiário {i:05d}", "estagiario", None, "6h"))
+    return linhas
+
+def _sortear_trocas(c, inicio, fim, taxa, rnd):
+    por_grupo = {}
+    for fid, tipo, escala_dias, turno in c.execute(
+            "SELECT id, tipo, escala_dias, turno FROM funcionarios"):
+        por_grupo.setdefault((tipo, escala_dias, turno), []).append(fid)
+    trocas = []
+    for ordinal in range(inicio.toordinal(), fim.toordinal() + 1):
+        dia = date.fromordinal(ordinal)
+        par = "pares" if dia.day % 2 == 0 else "ímpares"
+        folga = "ímpares" if par == "pares" else "pares"
+        for turno in ("12h", "12h noturno"):
+            trabalham = por_grupo.get(("12x36", par, turno), [])
+            livres = por_grupo.get(("12x36", folga, turno), [])
+            n = min(len(livres), round(len(trabalham) * taxa + rnd.random() - 0.5))
+            if n <= 0:
+                continue
+            for orig, sub in zip(rnd.sample(trabalham, n), rnd.sample(livres, n)):
+                trocas.append((orig, sub, dia.isoformat()))
+    return trocas
+
+def gerar_banco(caminho, funcionarios, anos, taxa_trocas=0.01, semente=0):
+    # cria (ou recria) o banco e devolve (linhas em escalas, trocas)
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    rnd = random.Random(semente)
+    db.configurar(caminho)
+    db.init_db()
+    with db.transacao() as c:
+        c.executemany("""
+            INSERT INTO funcionarios (nome, tipo, escala_dias, turno)
+            VALUES (?, ?, ?, ?)
+        """, _funcionarios(funcionarios, rnd))
+    inicio, _ = intervalo_mes(1, ANO_INICIAL)
+    _, fim = intervalo_mes(12, ANO_INICIAL + anos - 1)
+    gerar_escalas(listar_para_escala(), inicio, fim)
+    trocas = _sortear_trocas(db.conexao(), inicio, fim, taxa_trocas, rnd)
+    registrar_trocas(trocas)
+    c = db.conexao()
+    resumo = (c.execute("SELECT COUNT(*) FROM escalas").fetchone()[0],
+              c.execute("SELECT COUNT(*) FROM trocas").fetchone()[0])
+    c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.fechar()
+    return resumo
@@ -0,0 +1,172 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+from escalas import cobertura, db
+from escalas.datas import intervalo_mes
+from escalas.escala import (
+    cadastrar_funcionario,
+    gerar_escalas,
+    listar_para_escala,
+    regenerar_incremental,
+)
+from escalas.exportar import exportar_planilha
+from escalas.trocas import TrocaInvalida, registrar_troca, registrar_trocas
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de memória
+    resource = None
+
+# Cada operação recebe o banco já aberto e devolve quantas vezes repetiu o
+# trabalho (para o tempo por unidade). O preparo fica fora da medição.
+
+def _ultimo_mes(c):
+    fim = date.fromisoformat(c.execute("SELECT MAX(data) FROM escalas").fetchone()[0])
+    return fim.month, fim.year
+
+def _candidatos_troca(c, n):
+    # do último dia para trás: em cada turno, um plantonista do dia e um
+    # colega de folga, nenhum dos dois envolvido em troca naquela data.
+    # Para no primeiro dia do banco; pode devolver menos que n
+    grupos = {}
+    for fid, escala_dias, turno in c.execute(
+            "SELECT id, escala_dias, turno FROM funcionarios WHERE tipo = '12x36' ORDER BY id"):
+        grupos.setdefault((escala_dias, turno), []).append(fid)
+    primeiro, ultimo = c.execute("SELECT MIN(data), MAX(data) FROM escalas").fetchone()
+    if primeiro is None:
+        return []
+    primeiro, dia = date.fromisoformat(primeiro), date.fromisoformat(ultimo)
+    candidatos = []
+    while len(candidatos) < n and dia >= primeiro:
+        data = dia.isoformat()
+        envolvidos = {fid for par in c.execute("""
+            SELECT funcionario_original, funcionario_substituto FROM trocas WHERE data = ?
+        """, (data,)) for fid in par}
+        par, folga = ("pares", "ímpares") if dia.day % 2 == 0 else ("ímpares", "pares")
+        for turno in ("12h", "12h noturno"):
+            orig = [f for f in grupos.get((par, turno), ()) if f not in envolvidos]
+            sub = [f for f in grupos.get((folga, turno), ()) if f not in envolvidos]
+            if orig and sub and len(candidatos) < n:
+                candidatos.append((orig[0], sub[0], data))
+        dia = date.fromordinal(dia.toordinal() - 1)
+    return candidatos
+
+def preparar_gerar_mes(c):
+    mes, ano = _ultimo_mes(c)
+    mes, ano = (1, ano + 1) if mes == 12 else (mes + 1, ano)
+    return listar_para_escala(), mes, ano
+
+def gerar_mes(funcionarios, mes, ano):
+    gerar_escalas(funcionarios, *intervalo_mes(mes, ano))
+    return 1
+
+def preparar_cadastrar(c):
+    return ()
+
+def cadastrar(*_):
+    for i in range(10):
+        cadastrar_funcionario(f"Novo {i}", "12x36", "pares", "12h", None)
+    return 10
+
+def preparar_atualizar_escala(c):
+    return _ultimo_mes(c)
+
+def atualizar_escala(mes, ano):
+    regenerar_incremental(*intervalo_mes(mes, ano))
+    return 1
+
+def preparar_realizar_troca(c):
+    # a interface monta o índice de cobertura ao abrir; aqui também
+    cobertura.indice()
+    return (_candidatos_troca(c, 50),)
+
+def realizar_troca(candidatos):
+    # um candidato recusado pela validação também conta: o trabalho de
+    # validar foi feito
+    for orig, sub, data in candidatos:
+        try:
+            registrar_troca(orig, sub, data)
+        except TrocaInvalida:
+            pass
+    return len(candidatos)
+
+def preparar_importar_trocas(c):
+    cobertura.indice()
+    return (_candidatos_troca(c, 500),)
+
+def importar_trocas(candidatos):
+    registrar_trocas(candidatos)
+    return len(candidatos)
+
+def preparar_exportar_escalas_excel(c):
+    return (os.path.join(tempfile.mkdtemp(prefix="escalas_bench_"), "escalas.xlsx"),)
+
+def exportar_escalas_excel(path):
+    try:
+        exportar_planilha(path)
+    finally:
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+    return 1
+
+OPERACOES = {
+    "gerar_mes": (preparar_gerar_mes, gerar_mes),
+    "cadastrar_funcionario": (preparar_cadastrar, cadastrar),
+    "atualizar_escala": (preparar_atualizar_escala, atualizar_escala),
+    "realizar_troca": (preparar_realizar_troca, realizar_troca),
+    "importar_trocas": (preparar_importar_trocas, importar_trocas),
+    "exportar_escalas_excel": (preparar_exportar_escalas_excel, exportar_escalas_excel),
+}
+
+def _pico_kb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico // 1024 if sys.platform == "darwin" else pico
+
+def executar(operacao, banco):
+    # roda num processo novo, sobre uma cópia do banco: caches e conexões
+    # de uma operação não contaminam a seguinte
+    preparar, funcao = OPERACOES[operacao]
+    pasta = tempfile.mkdtemp(prefix="escalas_bench_")
+    try:
+        copia = os.path.join(pasta, "escalas.db")
+        shutil.copyfile(banco, copia)
+        db.configurar(copia)
+        # bancos gerados por versões anteriores passam pelas migrações
+        # aqui, fora da medição
+        db.init_db()
+        c = db.conexao()
+        args = preparar(c)
+
+        consultas, anterior = 0, None
+        def contar(sql):
+            # os gatilhos do diário não contam: chegam como "-- TRIGGER"
+            # (como em escalas.diagnostico) ou, conforme a versão do
+            # sqlite3, repetindo o texto do comando que os disparou
+            nonlocal consultas, anterior
+            if not sql.startswith("--") and sql != anterior:
+                consultas += 1
+            anterior = sql
+        c.set_trace_callback(contar)
+        pico_antes = _pico_kb()
+        inicio = time.perf_counter()
+        repeticoes = funcao(*args)
+        segundos = time.perf_counter() - inicio
+        pico_depois = _pico_kb()
+        c.set_trace_callback(None)
+        db.fechar()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return {
+        "operacao": operacao,
+        "segundos": round(segundos, 4),
+        "repeticoes": repeticoes,
+        "segundos_por_repeticao": round(segundos / repeticoes, 6) if repeticoes else None,
+        "consultas": consultas,
+        "pico_rss_kb": pico_depois,
+        "memoria_extra_kb": None if pico_antes is None else pico_depois - pico_antes,
+    }
@@ -1,231 +1,78 @@
 import sqlite3
+import threading
 import tkinter as tk
 from tkinter import messagebox, ttk, filedialog
-from datetime import datetime, timedelta
-import calendar
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
-
-# Tentar importar a biblioteca de feriados
-try:
-    import holidays
-    br_holidays = holidays.Brazil(subdiv='TO')
-except ImportError:
-    br_holidays = {}
-
-# Feriados municipais de Palmas-TO (dia/mês)
-palmas_holidays = {
-    "20/05": "Aniversário de Palmas",
-    # adicione outros feriados municipais aqui...
-}
-
-# Estilos de planilha
-header_fill   = PatternFill(start_color="ADD8E6", fill_type="solid")
-holiday_fill  = PatternFill(start_color="FFF2CC", fill_type="solid")
-bold_font     = Font(bold=True)
-center_align  = Alignment(horizontal="center")
-thin_border   = Border(left=Side('thin'), right=Side('thin'),
-                       top=Side('thin'), bottom=Side('thin'))
-
-# --- Banco de Dados ---
-def init_db():
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS funcionarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL,
-            tipo TEXT NOT NULL CHECK(tipo IN ('12x36','estagiario')),
-            escala_dias TEXT CHECK(escala_dias IN ('pares','ímpares')),
-            turno TEXT CHECK(turno IN ('12h','12h noturno','6h'))
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS escalas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            funcionario_id INTEGER NOT NULL,
-            data TEXT NOT NULL,
-            turno TEXT NOT NULL,
-            original BOOLEAN DEFAULT 1,
-            FOREIGN KEY(funcionario_id) REFERENCES funcionarios(id)
-        )
-    """)
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS trocas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data TEXT NOT NULL,
-            funcionario_original INTEGER NOT NULL,
-            funcionario_substituto INTEGER NOT NULL,
-            FOREIGN KEY(funcionario_original) REFERENCES funcionarios(id),
-            FOREIGN KEY(funcionario_substituto) REFERENCES funcionarios(id)
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()
-
-# --- Funções de negócio ---
-
-def listar_funcionarios():
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("SELECT id, nome, tipo FROM funcionarios ORDER BY nome")
-    funcs = c.fetchall()
-    conn.close()
-    return funcs
-
-def listar_para_escala():
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("SELECT id, tipo, escala_dias, turno FROM funcionarios")
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def cadastrar_funcionario(nome, tipo, escala_dias, turno, mes_ano):
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO funcionarios (nome, tipo, escala_dias, turno)
-        VALUES (?, ?, ?, ?)
-    """, (nome, tipo, escala_dias, turno))
-    fid = c.lastrowid
-    conn.commit()
-    conn.close()
-    gerar_escala(fid, tipo, escala_dias, turno, mes_ano)
-
-def gerar_escala(funcionario_id, tipo, escala_dias, turno, mes_ano):
-    if mes_ano:
-        try:
-            mes, ano = map(int, mes_ano.split("/"))
-        except:
-            return
-    else:
-        hoje = datetime.now()
-        mes, ano = hoje.month, hoje.year
-    primeiro = datetime(ano, mes, 1)
-    _, dias_no_mes = calendar.monthrange(ano, mes)
-
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    for i in range(dias_no_mes):
-        dia = primeiro + timedelta(days=i)
-        if tipo == "12x36":
-            if (escala_dias == "pares" and dia.day % 2 == 0) or \
-               (escala_dias == "ímpares" and dia.day % 2 != 0):
-                c.execute("""
-                    INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
-                    VALUES (?, ?, ?, 1)
-                """, (funcionario_id, dia.strftime("%d/%m/%Y"), turno))
-        else:  # estagiário
-            if dia.weekday() < 5:  # segunda a sexta
-                c.execute("""
-                    INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
-                    VALUES (?, ?, ?, 1)
-                """, (funcionario_id, dia.strftime("%d/%m/%Y"), turno))
-    conn.commit()
-    conn.close()
+from datetime import datetime
+
+from escalas import cobertura, copias, unidades
+from escalas.relatorios import exportar_saldo_csv
+from escalas import (
+    TrocaInvalida,
+    abaixo_do_minimo,
+    alterar_data_troca,
+    cadastrar_funcionario,
+    caminho_db,
+    data_exibicao,
+    data_iso,
+    desfazer,
+    excluir_funcionario,
+    exportar_planilha,
+    ha_escalas,
+    importar_trocas,
+    intervalo_mes,
+    listar_funcionarios,
+    regenerar_incremental,
+    registrar_troca,
+    sugerir_substitutos,
+    ultima_operacao,
+)
+from janela_diagnostico import JanelaDiagnostico
+from seletor_trocas import SeletorTrocas
+from tarefas import ExecutorTarefas
+
+# --- Ações da interface ---
+
+def periodo_exportacao():
+    # período opcional: de/até em MM/YYYY; em branco exporta tudo.
+    # Devolve (inicio, fim), com None nos lados em branco, ou None se inválido
+    de, ate = export_de_var.get().strip(), export_ate_var.get().strip()
+    inicio = fim = None
+    try:
+        if de:
+            ref = datetime.strptime(de, "%m/%Y")
+            inicio = intervalo_mes(ref.month, ref.year)[0]
+        if ate or de:
+            ref = datetime.strptime(ate or de, "%m/%Y")
+            fim = intervalo_mes(ref.month, ref.year)[1]
+    except ValueError:
+        messagebox.showerror("Erro", "Formato de Mês/Ano inválido. Use MM/YYYY.")
+        return None
+    if inicio and fim < inicio:
+        messagebox.showerror("Erro", "O mês final é anterior ao inicial.")
+        return None
+    return inicio, fim
 
 def exportar_escalas_excel():
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    try:
-        c.execute("SELECT DISTINCT turno FROM escalas ORDER BY turno")
-        turnos = [r[0] for r in c.fetchall()]
-        if not turnos:
-            messagebox.showinfo("Info", "Não há escalas para exportar.")
-            return
+    periodo = periodo_exportacao()
+    if periodo is None:
+        return
+    inicio, fim = periodo
+    if not ha_escalas(inicio, fim):
+        messagebox.showinfo("Info", "Não há escalas para exportar.")
+        return
 
-        wb = Workbook()
-        wb.remove(wb.active)
-
-        for turno in turnos:
-            ws = wb.create_sheet(title=turno[:31])
-            headers = ["Funcionário", "Turno", "Data", "Feriado", "Substituído Por"]
-            ws.append(headers)
-            # formata cabeçalho
-            for col in ws.iter_cols(min_row=1, max_row=1, min_col=1, max_col=len(headers)):
-                for cell in col:
-                    cell.fill = header_fill
-                    cell.font = bold_font
-                    cell.alignment = center_align
-                    cell.border = thin_border
-
-            # busca escalas
-            c.execute("""
-                SELECT e.id, f.id, f.nome, e.data, e.original
-                  FROM escalas e
-                  JOIN funcionarios f ON e.funcionario_id = f.id
-                 WHERE e.turno = ?
-                 ORDER BY e.data, f.nome
-            """, (turno,))
-            for esc_id, fid, nome, data_str, orig_flag in c.fetchall():
-                dt = datetime.strptime(data_str, "%d/%m/%Y").date()
-                # identifica feriado
-                feriado_nome = ""
-                # nacional/estadual
-                try:
-                    feriado_nome = br_holidays.get(dt, "")
-                except:
-                    feriado_nome = br_holidays.get(dt, "")
-                # municipal
-                md = dt.strftime("%d/%m")
-                if md in palmas_holidays:
-                    if feriado_nome:
-                        feriado_nome += f"; {palmas_holidays[md]}"
-                    else:
-                        feriado_nome = palmas_holidays[md]
-
-                # substituição
-                substituido_por = ""
-                if orig_flag == 0:
-                    c.execute("""
-                        SELECT fs.nome
-                          FROM trocas t
-                          JOIN funcionarios fs ON t.funcionario_substituto = fs.id
-                         WHERE t.data = ? AND t.funcionario_original = ?
-                    """, (data_str, fid))
-                    res = c.fetchone()
-                    substituido_por = res[0] if res else ""
-                else:
-                    # pular registro do substituto
-                    c.execute("""
-                        SELECT 1 FROM trocas
-                         WHERE data = ? AND funcionario_substituto = ?
-                    """, (data_str, fid))
-                    if c.fetchone():
-                        continue
-
-                # escreve linha
-                ws.append([nome, turno, data_str, feriado_nome, substituido_por])
-                # destaca linha de feriado
-                if feriado_nome:
-                    row = ws.max_row
-                    for col_idx in range(1, len(headers) + 1):
-                        ws.cell(row=row, column=col_idx).fill = holiday_fill
-
-            # formata dados e ajusta colunas
-            for row in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=len(headers)):
-                for cell in row:
-                    cell.alignment = center_align
-                    cell.border = thin_border
-            for col in ws.columns:
-                max_len = max(len(str(c.value)) if c.value else 0 for c in col)
-                ws.column_dimensions[col[0].column_letter].width = max_len + 2
-
-        path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel", "*.xlsx")],
-            title="Salvar planilha"
-        )
-        if path:
-            wb.save(path)
-            messagebox.showinfo("Sucesso", "Planilha salva com sucesso!")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Falha ao exportar:\n{e}")
-    finally:
-        conn.close()
+    path = filedialog.asksaveasfilename(
+        defaultextension=".xlsx",
+        filetypes=[("Excel", "*.xlsx")],
+        title="Salvar planilha"
+    )
+    if not path:
+        return
+    executor.executar(
+        "Exportando escalas", exportar_planilha, path, inicio, fim, export_saldo_var.get(),
+        ao_concluir=lambda _: messagebox.showinfo("Sucesso", "Planilha salva com sucesso!"),
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao exportar:\n{e}"),
+    )
 
 def realizar_troca():
     orig = funcionario_original_var.get()
@@ -240,66 +87,76 @@ def realizar_troca():
     except:
         messagebox.showerror("Erro", "Formato inválido.")
         return
-    if id_orig == id_sub:
-        messagebox.showerror("Erro", "Original e substituto devem ser diferentes.")
-        return
     try:
-        dt = datetime.strptime(data_txt, "%d/%m/%Y")
+        dstr = data_iso(data_txt)
     except:
         messagebox.showerror("Erro", "Formato de data inválido. Use DD/MM/AAAA.")
         return
-    dstr = dt.strftime("%d/%m/%Y")
 
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("SELECT 1 FROM trocas WHERE funcionario_original = ? AND data = ?", (id_orig, dstr))
-    if c.fetchone():
-        messagebox.showerror("Erro", "Já foi substituído neste dia.")
-        conn.close()
+    try:
+        registrar_troca(id_orig, id_sub, dstr)
+    except TrocaInvalida as e:
+        messagebox.showerror("Erro", str(e))
         return
-
-    c.execute("SELECT id, original FROM escalas WHERE funcionario_id = ? AND data = ?", (id_orig, dstr))
-    row = c.fetchone()
-    if not row:
-        messagebox.showerror("Erro", "Funcionário não estava escalado neste dia.")
-        conn.close()
+    except sqlite3.Error as e:
+        messagebox.showerror("Erro", f"Falha ao registrar troca:\n{e}")
         return
-    esc_id, flag = row
-    if flag == 0:
-        messagebox.showerror("Erro", "Escala já não é original.")
-        conn.close()
+    messagebox.showinfo("Sucesso", "Troca realizada com sucesso!")
+    funcionario_original_var.set("")
+    funcionario_substituto_var.set("")
+    troca_data_entry.delete(0, tk.END)
+    sugestao_var.set("")
+    atualizar_comboboxes_troca(listar_funcionarios())
+
+def sugerir_substituto():
+    # troca a lista do substituto pelos colegas sugeridos, o melhor já
+    # selecionado; atualizar_lista devolve a lista completa
+    orig = funcionario_original_var.get()
+    try:
+        id_orig = int(orig.split(" - ")[0])
+        dstr = data_iso(troca_data_entry.get().strip())
+    except ValueError:
+        messagebox.showerror("Erro", "Selecione o original e informe a data (DD/MM/AAAA).")
         return
-
-    c.execute("SELECT turno FROM funcionarios WHERE id = ?", (id_sub,))
-    res = c.fetchone()
-    if not res:
-        messagebox.showerror("Erro", "Turno do substituto não encontrado.")
-        conn.close()
+    try:
+        sugestoes = sugerir_substitutos(id_orig, dstr)
+    except TrocaInvalida as e:
+        messagebox.showerror("Erro", str(e))
+        return
+    if not sugestoes:
+        messagebox.showinfo("Sugestão", "Nenhum substituto disponível neste dia.")
+        return
+    funcionario_substituto_combo['values'] = [
+        f"{fid} - {nome}" for fid, nome, _, _ in sugestoes]
+    funcionario_substituto_combo.current(0)
+    _, _, turno, trocas = sugestoes[0]
+    sugestao_var.set(f"{turno}, {trocas} trocas recentes")
+
+def importar_trocas_arquivo():
+    path = filedialog.askopenfilename(
+        filetypes=[("Planilhas", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")],
+        title="Importar trocas"
+    )
+    if not path:
         return
-    turno_sub = res[0]
 
-    try:
-        conn.execute("BEGIN")
-        c.execute("""
-            INSERT INTO trocas (data, funcionario_original, funcionario_substituto)
-            VALUES (?, ?, ?)
-        """, (dstr, id_orig, id_sub))
-        c.execute("UPDATE escalas SET original = 0 WHERE id = ?", (esc_id,))
-        c.execute("""
-            INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
-            VALUES (?, ?, ?, 1)
-        """, (id_sub, dstr, turno_sub))
-        conn.commit()
-        messagebox.showinfo("Sucesso", "Troca realizada com sucesso!")
-        funcionario_original_var.set("")
-        funcionario_substituto_var.set("")
-        troca_data_entry.delete(0, tk.END)
-        atualizar_lista()
-    except sqlite3.Error as e:
-        conn.rollback()
-        messagebox.showerror("Erro", f"Falha ao registrar troca:\n{e}")
-    finally:
-        conn.close()
+    def concluido(resultado):
+        gravadas, erros = resultado
+        msg = f"{gravadas} trocas registradas."
+        if erros:
+            msg += f"\n{len(erros)} linhas com erro:\n"
+            msg += "\n".join(f"Linha {linha}: {erro}" for linha, erro in erros[:15])
+            if len(erros) > 15:
+                msg += f"\n... e mais {len(erros) - 15}."
+            messagebox.showwarning("Importação de Trocas", msg)
+        else:
+            messagebox.showinfo("Sucesso", msg)
+
+    executor.executar(
+        "Importando trocas", importar_trocas, path,
+        ao_concluir=concluido,
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao importar trocas:\n{e}"),
+    )
 
 def cadastrar():
     nome        = nome_entry.get().strip()
@@ -342,32 +199,16 @@ def remover_funcionario():
     nome = tree.item(sel[0])['values'][1]
     if not messagebox.askyesno("Confirmar", f"Remover {nome}?"):
         return
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("DELETE FROM funcionarios WHERE id = ?", (fid,))
-    c.execute("DELETE FROM escalas WHERE funcionario_id = ?", (fid,))
-    conn.commit()
-    conn.close()
+    excluir_funcionario(fid)
     atualizar_lista()
 
-def atualizar_comboboxes_troca():
-    vals = [f"{i} - {n}" for i, n, _ in listar_funcionarios()]
+def atualizar_comboboxes_troca(funcionarios):
+    vals = [f"{i} - {n}" for i, n, _ in funcionarios]
     funcionario_original_combo['values'] = vals
     funcionario_substituto_combo['values'] = vals
 
-def atualizar_combobox_editar():
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("""
-        SELECT t.id, fo.nome, fs.nome, t.data
-          FROM trocas t
-          JOIN funcionarios fo ON t.funcionario_original = fo.id
-          JOIN funcionarios fs ON t.funcionario_substituto = fs.id
-         ORDER BY t.data DESC
-    """)
-    items = [f"{tid} - {orig} → {sub} em {dt}" for tid, orig, sub, dt in c.fetchall()]
-    conn.close()
-    troca_editar_combo['values'] = items
+def buscar_troca_editar():
+    SeletorTrocas(root, troca_editar_var.set)
 
 def editar_troca():
     sel = troca_editar_var.get().split(" - ")[0]
@@ -376,38 +217,21 @@ def editar_troca():
         messagebox.showerror("Erro", "Selecione a troca e informe a nova data.")
         return
     try:
-        new_dt = datetime.strptime(nova, "%d/%m/%Y").strftime("%d/%m/%Y")
+        new_dt = data_iso(nova)
     except:
         messagebox.showerror("Erro", "Formato de data inválido. Use DD/MM/AAAA.")
         return
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    c.execute("SELECT funcionario_original, funcionario_substituto, data FROM trocas WHERE id = ?", (sel,))
-    row = c.fetchone()
-    if not row:
-        messagebox.showerror("Erro", "Troca não encontrada.")
-        conn.close()
-        return
-    orig_id, sub_id, old_dt = row
     try:
-        conn.execute("BEGIN")
-        c.execute("UPDATE trocas SET data = ? WHERE id = ?", (new_dt, sel))
-        c.execute("UPDATE escalas SET original = 1 WHERE funcionario_id = ? AND data = ?", (orig_id, old_dt))
-        c.execute("DELETE FROM escalas WHERE funcionario_id = ? AND data = ?", (sub_id, old_dt))
-        c.execute("UPDATE escalas SET original = 0 WHERE funcionario_id = ? AND data = ?", (orig_id, new_dt))
-        c.execute("""
-            INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
-            VALUES (?, ?, (SELECT turno FROM funcionarios WHERE id = ?), 1)
-        """, (sub_id, new_dt, sub_id))
-        conn.commit()
-        messagebox.showinfo("Sucesso", "Data de troca atualizada com sucesso!")
-        nova_data_entry.delete(0, tk.END)
-        atualizar_lista()
+        alterar_data_troca(sel, new_dt)
+    except TrocaInvalida as e:
+        messagebox.showerror("Erro", str(e))
+        return
     except sqlite3.Error as e:
-        conn.rollback()
         messagebox.showerror("Erro", f"Falha ao editar troca:\n{e}")
-    finally:
-        conn.close()
+        return
+    messagebox.showinfo("Sucesso", "Data de troca atualizada com sucesso!")
+    troca_editar_var.set("")
+    nova_data_entry.delete(0, tk.END)
 
 def atualizar_escala():
     mes_ano = atualiza_mes_ano_var.get().strip()
@@ -415,115 +239,316 @@ def atualizar_escala():
         messagebox.showerror("Erro", "Informe Mês/Ano para atualizar.")
         return
     try:
-        datetime.strptime(mes_ano, "%m/%Y")
+        ref = datetime.strptime(mes_ano, "%m/%Y")
     except:
         messagebox.showerror("Erro", "Formato de Mês/Ano inválido. Use MM/YYYY.")
         return
-    conn = sqlite3.connect("escalas.db")
-    c = conn.cursor()
-    pattern = "%/" + mes_ano  # ex: "%/04/2025"
-    c.execute("DELETE FROM escalas WHERE data LIKE ?", (pattern,))
-    conn.commit()
-    conn.close()
-    for fid, tipo, esc_dias, turno in listar_para_escala():
-        gerar_escala(fid, tipo, esc_dias, turno, mes_ano)
-    messagebox.showinfo("Sucesso", f"Escala atualizada para {mes_ano}!")
+    inicio, fim = intervalo_mes(ref.month, ref.year)
+
+    def concluido(resultado):
+        inseridas, removidas, alteradas = resultado
+        messagebox.showinfo(
+            "Sucesso",
+            f"Escala atualizada para {mes_ano}!\n"
+            f"{inseridas} plantões incluídos, {removidas} removidos, {alteradas} alterados.")
+
+    executor.executar(
+        "Atualizando escala", regenerar_incremental, inicio, fim,
+        ao_concluir=concluido,
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao atualizar escala:\n{e}"),
+    )
+
+def exportar_saldo():
+    periodo = periodo_exportacao()
+    if periodo is None:
+        return
+    if not ha_escalas(*periodo):
+        messagebox.showinfo("Info", "Não há escalas no período.")
+        return
+    path = filedialog.asksaveasfilename(
+        defaultextension=".csv",
+        filetypes=[("CSV", "*.csv")],
+        title="Salvar saldo de horas"
+    )
+    if not path:
+        return
+    executor.executar(
+        "Calculando saldo de horas", exportar_saldo_csv, path, *periodo,
+        ao_concluir=lambda _: messagebox.showinfo("Sucesso", "Saldo de horas salvo com sucesso!"),
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao calcular o saldo:\n{e}"),
+    )
+
+def desfazer_ultima():
+    ultima = ultima_operacao()
+    if ultima is None:
+        messagebox.showinfo("Desfazer", "Não há operação para desfazer.")
+        return
+    _, momento, descricao = ultima
+    if not messagebox.askyesno("Desfazer", f"Desfazer \"{descricao}\" ({momento})?"):
+        return
+
+    def concluido(descricao):
+        messagebox.showinfo("Sucesso", f"Desfeito: {descricao}")
+        troca_editar_var.set("")
+        atualizar_lista()
+
+    executor.executar(
+        "Desfazendo", desfazer,
+        ao_concluir=concluido,
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao desfazer:\n{e}"),
+    )
+
+def restaurar_copia_banco():
+    if executor.ocupado:
+        messagebox.showwarning("Restaurar", "Aguarde a operação em andamento terminar.")
+        return
+    path = filedialog.askopenfilename(
+        initialdir=copias.pasta_padrao(),
+        filetypes=[("Cópias do banco", "*.db")],
+        title="Restaurar cópia"
+    )
+    if not path:
+        return
+    if not messagebox.askyesno(
+            "Restaurar", "Todas as alterações feitas depois desta cópia serão descartadas.\n"
+                         "O estado atual fica guardado numa cópia nova. Continuar?"):
+        return
+
+    def concluido(anterior):
+        messagebox.showinfo("Sucesso", f"Banco restaurado.\nO estado anterior ficou em:\n{anterior}")
+        threading.Thread(target=cobertura.indice, daemon=True).start()
+        troca_editar_var.set("")
+        atualizar_lista()
+
+    executor.executar(
+        "Restaurando cópia", copias.restaurar_copia, path,
+        ao_concluir=concluido,
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao restaurar:\n{e}"),
+    )
+
+def trocar_unidade(_evento=None):
+    escolhida = next(u for u in lista_unidades if u["nome"] == unidade_var.get())
+    if escolhida["banco"] == caminho_db():
+        return
+    if executor.ocupado:
+        # as tarefas em andamento usam o banco da unidade atual
+        messagebox.showwarning("Unidade", "Aguarde a operação em andamento terminar.")
+        unidade_var.set(unidade_atual()["nome"])
+        return
+    unidades.ativar(escolhida)
+    threading.Thread(target=cobertura.indice, daemon=True).start()
+    root.title(f"Sistema de Escalas - {escolhida['nome']}")
+    troca_editar_var.set("")
     atualizar_lista()
 
+def unidade_atual():
+    return next(u for u in lista_unidades if u["banco"] == caminho_db())
+
+def mensagem_unidades(resultados, erros, formato):
+    linhas = [formato(nome, r) for nome, r in sorted(resultados.items())]
+    linhas += [f"{nome}: erro: {erro}" for nome, erro in erros]
+    (messagebox.showwarning if erros else messagebox.showinfo)("Unidades", "\n".join(linhas))
+
+def exportar_todas_unidades():
+    periodo = periodo_exportacao()
+    if periodo is None:
+        return
+    pasta = filedialog.askdirectory(title="Pasta das planilhas")
+    if not pasta:
+        return
+    executor.executar(
+        "Exportando unidades", unidades.exportar_todas, lista_unidades, pasta, *periodo,
+        ao_concluir=lambda r: mensagem_unidades(
+            *r, lambda nome, path: f"{nome}: {path or 'sem escalas no período'}"),
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao exportar:\n{e}"),
+    )
+
+def gerar_todas_unidades():
+    mes_ano = atualiza_mes_ano_var.get().strip()
+    try:
+        ref = datetime.strptime(mes_ano, "%m/%Y")
+    except ValueError:
+        messagebox.showerror("Erro", "Informe o Mês/Ano (MM/YYYY) em Atualizar Escala.")
+        return
+    inicio, fim = intervalo_mes(ref.month, ref.year)
+
+    def concluido(resultado):
+        # os processos gravaram por fora: o índice da unidade aberta relê o mês
+        cobertura.recarregar(inicio.isoformat(), fim.isoformat())
+        mensagem_unidades(*resultado, lambda nome, n: f"{nome}: {n} plantões gravados")
+
+    executor.executar(
+        "Gerando escalas", unidades.gerar_todas, lista_unidades, inicio, fim,
+        ao_concluir=concluido,
+        ao_falhar=lambda e: messagebox.showerror("Erro", f"Falha ao gerar escalas:\n{e}"),
+    )
+
+# id -> (nome, tipo) do que está na tela; a lista só recebe as diferenças
+funcionarios_modelo = {}
+
+def verificar_cobertura():
+    mes_ano = atualiza_mes_ano_var.get().strip()
+    try:
+        ref = datetime.strptime(mes_ano, "%m/%Y")
+    except:
+        messagebox.showerror("Erro", "Formato de Mês/Ano inválido. Use MM/YYYY.")
+        return
+    faltas = abaixo_do_minimo(*intervalo_mes(ref.month, ref.year))
+    if not faltas:
+        messagebox.showinfo("Cobertura", f"Todos os turnos de {mes_ano} estão cobertos.")
+        return
+    linhas = [f"{data_exibicao(d)} {turno}: {n} de {minimo}" for d, turno, n, minimo in faltas]
+    if len(linhas) > 20:
+        linhas = linhas[:20] + [f"... e mais {len(faltas) - 20}."]
+    messagebox.showwarning("Cobertura", f"Turnos abaixo do mínimo em {mes_ano}:\n" + "\n".join(linhas))
+
 def atualizar_lista():
-    for item in tree.get_children():
-        tree.delete(item)
-    for i, n, t in listar_funcionarios():
-        tree.insert("", "end", values=(i, n, t))
-    atualizar_comboboxes_troca()
-    atualizar_combobox_editar()
+    funcionarios = listar_funcionarios()
+    novo = {i: (n, t) for i, n, t in funcionarios}
+    if novo == funcionarios_modelo:
+        return
+    # renomeados saem e voltam na nova posição alfabética, junto com os novos
+    for fid, (nome, _) in funcionarios_modelo.items():
+        if fid not in novo or novo[fid][0] != nome:
+            tree.delete(str(fid))
+    for pos, (i, n, t) in enumerate(funcionarios):
+        anterior = funcionarios_modelo.get(i)
+        if anterior is None or anterior[0] != n:
+            tree.insert("", pos, iid=str(i), values=(i, n, t))
+        elif anterior[1] != t:
+            tree.item(str(i), values=(i, n, t))
+    funcionarios_modelo.clear()
+    funcionarios_modelo.update(novo)
+    atualizar_comboboxes_troca(funcionarios)
 
 # --- Interface Gráfica ---
-root = tk.Tk()
-root.title("Sistema de Escalas")
-root.geometry("600x900")
-
-# Cadastro de Funcionário
-frame_cad = tk.LabelFrame(root, text="Cadastro de Funcionário", padx=10, pady=10)
-frame_cad.grid(row=0, column=0, padx=10, pady=5, sticky="ew")
-tk.Label(frame_cad, text="Nome:").grid(row=0, column=0, sticky="w")
-nome_entry = tk.Entry(frame_cad, width=30)
-nome_entry.grid(row=0, column=1, pady=2)
-tk.Label(frame_cad, text="Tipo:").grid(row=1, column=0, sticky="w")
-tipo_var = tk.StringVar()
-tk.Radiobutton(frame_cad, text="12x36", variable=tipo_var, value="12x36").grid(row=1, column=1, sticky="w")
-tk.Radiobutton(frame_cad, text="Estagiário", variable=tipo_var, value="estagiario").grid(row=1, column=2, sticky="w")
-tk.Label(frame_cad, text="Escala Dias:").grid(row=2, column=0, sticky="w")
-escala_dias_var = tk.StringVar()
-ttk.Combobox(frame_cad, textvariable=escala_dias_var, values=["pares","ímpares"], width=15).grid(row=2, column=1, pady=2, sticky="w")
-tk.Label(frame_cad, text="Turno:").grid(row=3, column=0, sticky="w")
-turno_var = tk.StringVar()
-ttk.Combobox(frame_cad, textvariable=turno_var, values=["12h","12h noturno","6h"], width=15).grid(row=3, column=1, pady=2, sticky="w")
-tk.Label(frame_cad, text="Mês/Ano (MM/YYYY):").grid(row=4, column=0, sticky="w")
-mes_ano_var = tk.StringVar()
-tk.Entry(frame_cad, textvariable=mes_ano_var, width=15).grid(row=4, column=1, pady=2, sticky="w")
-tk.Button(frame_cad, text="Cadastrar", command=cadastrar).grid(row=5, column=0, columnspan=3, pady=5)
-
-# Lista de Funcionários
-frame_list = tk.LabelFrame(root, text="Funcionários Cadastrados", padx=10, pady=10)
-frame_list.grid(row=1, column=0, padx=10, pady=5, sticky="nsew")
-tree = ttk.Treeview(frame_list, columns=("ID","Nome","Tipo"), show="headings", height=8)
-for col, w in [("ID",50),("Nome",200),("Tipo",100)]:
-    tree.heading(col, text=col)
-    tree.column(col, width=w, anchor="center")
-tree.grid(row=0, column=0, sticky="nsew")
-ttk.Scrollbar(frame_list, orient="vertical", command=tree.yview).grid(row=0, column=1, sticky="ns")
-tree.configure(yscrollcommand=frame_list.children['!scrollbar'].set)
-tk.Button(frame_list, text="Remover", command=remover_funcionario).grid(row=1, column=0, pady=5)
-
-# Troca de Turno
-frame_troca = tk.LabelFrame(root, text="Troca de Turno", padx=10, pady=10)
-frame_troca.grid(row=2, column=0, padx=10, pady=5, sticky="ew")
-tk.Label(frame_troca, text="Original:").grid(row=0, column=0, sticky="w")
-funcionario_original_var = tk.StringVar()
-funcionario_original_combo = ttk.Combobox(frame_troca, textvariable=funcionario_original_var, width=30)
-funcionario_original_combo.grid(row=0, column=1, pady=2, sticky="w")
-tk.Label(frame_troca, text="Substituto:").grid(row=1, column=0, sticky="w")
-funcionario_substituto_var = tk.StringVar()
-funcionario_substituto_combo = ttk.Combobox(frame_troca, textvariable=funcionario_substituto_var, width=30)
-funcionario_substituto_combo.grid(row=1, column=1, pady=2, sticky="w")
-tk.Label(frame_troca, text="Data (DD/MM/AAAA):").grid(row=2, column=0, sticky="w")
-troca_data_entry = tk.Entry(frame_troca, width=15)
-troca_data_entry.grid(row=2, column=1, pady=2, sticky="w")
-tk.Button(frame_troca, text="Realizar Troca", command=realizar_troca).grid(row=3, column=0, columnspan=2, pady=5)
-
-# Editar Troca
-frame_editar = tk.LabelFrame(root, text="Editar Data de Troca", padx=10, pady=10)
-frame_editar.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
-tk.Label(frame_editar, text="Selecione Troca:").grid(row=0, column=0, sticky="w")
-troca_editar_var = tk.StringVar()
-troca_editar_combo = ttk.Combobox(frame_editar, textvariable=troca_editar_var, width=40)
-troca_editar_combo.grid(row=0, column=1, pady=2, sticky="w")
-tk.Label(frame_editar, text="Nova Data (DD/MM/AAAA):").grid(row=1, column=0, sticky="w")
-nova_data_entry = tk.Entry(frame_editar, width=15)
-nova_data_entry.grid(row=1, column=1, pady=2, sticky="w")
-tk.Button(frame_editar, text="Salvar Alteração", command=editar_troca).grid(row=2, column=0, columnspan=2, pady=5)
-
-# Atualizar Escala
-frame_atualizar = tk.LabelFrame(root, text="Atualizar Escala", padx=10, pady=10)
-frame_atualizar.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
-tk.Label(frame_atualizar, text="Mês/Ano (MM/YYYY):").grid(row=0, column=0, sticky="w")
-atualiza_mes_ano_var = tk.StringVar()
-tk.Entry(frame_atualizar, textvariable=atualiza_mes_ano_var, width=15).grid(row=0, column=1, pady=2, sticky="w")
-tk.Button(frame_atualizar, text="Atualizar Escala", command=atualizar_escala).grid(row=1, column=0, columnspan=2, pady=5)
-
-# Exportar para Excel
-frame_export = tk.Frame(root)
-frame_export.grid(row=5, column=0, pady=10)
-tk.Button(frame_export, text="Exportar Escalas para Excel", command=exportar_escalas_excel).pack()
-
-# Layout de redimensionamento
-root.grid_rowconfigure(1, weight=1)
-root.grid_columnconfigure(0, weight=1)
-frame_list.grid_rowconfigure(0, weight=1)
-frame_list.grid_columnconfigure(0, weight=1)
-
-# Inicializa listas
-atualizar_lista()
-
-root.mainloop()
+# só no processo principal: os workers de unidades.py (spawn) importam
+# este arquivo de novo e não podem abrir janela nem iniciar threads
+if __name__ == "__main__":
+    lista_unidades = unidades.carregar()
+    unidades.ativar(lista_unidades[0])
+    # monta o índice de cobertura em segundo plano; a primeira troca não espera
+    threading.Thread(target=cobertura.indice, daemon=True).start()
+    # cópia do banco em uso a cada 30 minutos, se ele mudou
+    copias.copias_periodicas()
+
+    root = tk.Tk()
+    root.title("Sistema de Escalas")
+    root.geometry("600x900")
+    executor = ExecutorTarefas(root)
+
+    # Unidade (só aparece com mais de uma em unidades.json)
+    unidade_var = tk.StringVar(value=lista_unidades[0]["nome"])
+    if len(lista_unidades) > 1:
+        root.title(f"Sistema de Escalas - {lista_unidades[0]['nome']}")
+        frame_unidade = tk.Frame(root)
+        frame_unidade.grid(row=0, column=0, padx=10, pady=(10, 0), sticky="ew")
+        tk.Label(frame_unidade, text="Unidade:").pack(side="left")
+        combo_unidade = ttk.Combobox(frame_unidade, textvariable=unidade_var, state="readonly",
+                                     values=[u["nome"] for u in lista_unidades], width=25)
+        combo_unidade.pack(side="left", padx=5)
+        combo_unidade.bind("<<ComboboxSelected>>", trocar_unidade)
+        tk.Button(frame_unidade, text="Gerar Mês em Todas", command=gerar_todas_unidades).pack(side="left", padx=5)
+        tk.Button(frame_unidade, text="Exportar Todas...", command=exportar_todas_unidades).pack(side="left", padx=5)
+
+    # Cadastro de Funcionário
+    frame_cad = tk.LabelFrame(root, text="Cadastro de Funcionário", padx=10, pady=10)
+    frame_cad.grid(row=1, column=0, padx=10, pady=5, sticky="ew")
+    tk.Label(frame_cad, text="Nome:").grid(row=0, column=0, sticky="w")
+    nome_entry = tk.Entry(frame_cad, width=30)
+    nome_entry.grid(row=0, column=1, pady=2)
+    tk.Label(frame_cad, text="Tipo:").grid(row=1, column=0, sticky="w")
+    tipo_var = tk.StringVar()
+    tk.Radiobutton(frame_cad, text="12x36", variable=tipo_var, value="12x36").grid(row=1, column=1, sticky="w")
+    tk.Radiobutton(frame_cad, text="Estagiário", variable=tipo_var, value="estagiario").grid(row=1, column=2, sticky="w")
+    tk.Label(frame_cad, text="Escala Dias:").grid(row=2, column=0, sticky="w")
+    escala_dias_var = tk.StringVar()
+    ttk.Combobox(frame_cad, textvariable=escala_dias_var, values=["pares","ímpares"], width=15).grid(row=2, column=1, pady=2, sticky="w")
+    tk.Label(frame_cad, text="Turno:").grid(row=3, column=0, sticky="w")
+    turno_var = tk.StringVar()
+    ttk.Combobox(frame_cad, textvariable=turno_var, values=["12h","12h noturno","6h"], width=15).grid(row=3, column=1, pady=2, sticky="w")
+    tk.Label(frame_cad, text="Mês/Ano (MM/YYYY):").grid(row=4, column=0, sticky="w")
+    mes_ano_var = tk.StringVar()
+    tk.Entry(frame_cad, textvariable=mes_ano_var, width=15).grid(row=4, column=1, pady=2, sticky="w")
+    tk.Button(frame_cad, text="Cadastrar", command=cadastrar).grid(row=5, column=0, columnspan=3, pady=5)
+
+    # Lista de Funcionários
+    frame_list = tk.LabelFrame(root, text="Funcionários Cadastrados", padx=10, pady=10)
+    frame_list.grid(row=2, column=0, padx=10, pady=5, sticky="nsew")
+    tree = ttk.Treeview(frame_list, columns=("ID","Nome","Tipo"), show="headings", height=8)
+    for col, w in [("ID",50),("Nome",200),("Tipo",100)]:
+        tree.heading(col, text=col)
+        tree.column(col, width=w, anchor="center")
+    tree.grid(row=0, column=0, sticky="nsew")
+    ttk.Scrollbar(frame_list, orient="vertical", command=tree.yview).grid(row=0, column=1, sticky="ns")
+    tree.configure(yscrollcommand=frame_list.children['!scrollbar'].set)
+    tk.Button(frame_list, text="Remover", command=remover_funcionario).grid(row=1, column=0, pady=5)
+
+    # Troca de Turno
+    frame_troca = tk.LabelFrame(root, text="Troca de Turno", padx=10, pady=10)
+    frame_troca.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
+    tk.Label(frame_troca, text="Original:").grid(row=0, column=0, sticky="w")
+    funcionario_original_var = tk.StringVar()
+    funcionario_original_combo = ttk.Combobox(frame_troca, textvariable=funcionario_original_var, width=30)
+    funcionario_original_combo.grid(row=0, column=1, pady=2, sticky="w")
+    tk.Label(frame_troca, text="Substituto:").grid(row=1, column=0, sticky="w")
+    funcionario_substituto_var = tk.StringVar()
+    funcionario_substituto_combo = ttk.Combobox(frame_troca, textvariable=funcionario_substituto_var, width=30)
+    funcionario_substituto_combo.grid(row=1, column=1, pady=2, sticky="w")
+    tk.Label(frame_troca, text="Data (DD/MM/AAAA):").grid(row=2, column=0, sticky="w")
+    troca_data_entry = tk.Entry(frame_troca, width=15)
+    troca_data_entry.grid(row=2, column=1, pady=2, sticky="w")
+    tk.Button(frame_troca, text="Sugerir", command=sugerir_substituto).grid(row=1, column=2, padx=5)
+    sugestao_var = tk.StringVar()
+    tk.Label(frame_troca, textvariable=sugestao_var, fg="gray").grid(row=2, column=2, sticky="w")
+    tk.Button(frame_troca, text="Realizar Troca", command=realizar_troca).grid(row=3, column=0, pady=5)
+    tk.Button(frame_troca, text="Importar Trocas...", command=importar_trocas_arquivo).grid(row=3, column=1, pady=5)
+
+    # Editar Troca
+    frame_editar = tk.LabelFrame(root, text="Editar Data de Troca", padx=10, pady=10)
+    frame_editar.grid(row=4, column=0, padx=10, pady=5, sticky="ew")
+    tk.Label(frame_editar, text="Selecione Troca:").grid(row=0, column=0, sticky="w")
+    troca_editar_var = tk.StringVar()
+    tk.Entry(frame_editar, textvariable=troca_editar_var, width=40, state="readonly").grid(row=0, column=1, pady=2, sticky="w")
+    tk.Button(frame_editar, text="Buscar...", command=buscar_troca_editar).grid(row=0, column=2, padx=5)
+    tk.Label(frame_editar, text="Nova Data (DD/MM/AAAA):").grid(row=1, column=0, sticky="w")
+    nova_data_entry = tk.Entry(frame_editar, width=15)
+    nova_data_entry.grid(row=1, column=1, pady=2, sticky="w")
+    tk.Button(frame_editar, text="Salvar Alteração", command=editar_troca).grid(row=2, column=0, columnspan=2, pady=5)
+
+    # Atualizar Escala
+    frame_atualizar = tk.LabelFrame(root, text="Atualizar Escala", padx=10, pady=10)
+    frame_atualizar.grid(row=5, column=0, padx=10, pady=5, sticky="ew")
+    tk.Label(frame_atualizar, text="Mês/Ano (MM/YYYY):").grid(row=0, column=0, sticky="w")
+    atualiza_mes_ano_var = tk.StringVar()
+    tk.Entry(frame_atualizar, textvariable=atualiza_mes_ano_var, width=15).grid(row=0, column=1, pady=2, sticky="w")
+    tk.Button(frame_atualizar, text="Atualizar Escala", command=atualizar_escala).grid(row=1, column=0, pady=5)
+    tk.Button(frame_atualizar, text="Verificar Cobertura", command=verificar_cobertura).grid(row=1, column=1, pady=5)
+    tk.Button(frame_atualizar, text="Desfazer Última...", command=desfazer_ultima).grid(row=2, column=0, pady=5)
+    tk.Button(frame_atualizar, text="Restaurar Cópia...", command=restaurar_copia_banco).grid(row=2, column=1, pady=5)
+
+    # Exportar para Excel
+    frame_export = tk.Frame(root)
+    frame_export.grid(row=6, column=0, pady=10)
+    tk.Label(frame_export, text="De (MM/YYYY):").pack(side="left")
+    export_de_var = tk.StringVar()
+    tk.Entry(frame_export, textvariable=export_de_var, width=8).pack(side="left", padx=(0, 5))
+    tk.Label(frame_export, text="Até:").pack(side="left")
+    export_ate_var = tk.StringVar()
+    tk.Entry(frame_export, textvariable=export_ate_var, width=8).pack(side="left", padx=(0, 5))
+    export_saldo_var = tk.BooleanVar()
+    tk.Checkbutton(frame_export, text="com saldo", variable=export_saldo_var).pack(side="left")
+    tk.Button(frame_export, text="Exportar Escalas para Excel", command=exportar_escalas_excel).pack(side="left", padx=5)
+    tk.Button(frame_export, text="Saldo (CSV)...", command=exportar_saldo).pack(side="left", padx=5)
+    tk.Button(frame_export, text="Diagnóstico", command=lambda: JanelaDiagnostico(root)).pack(side="left", padx=5)
+
+    # Layout de redimensionamento
+    root.grid_rowconfigure(2, weight=1)
+    root.grid_columnconfigure(0, weight=1)
+    frame_list.grid_rowconfigure(0, weight=1)
+    frame_list.grid_columnconfigure(0, weight=1)
+
+    # Inicializa listas
+    atualizar_lista()
+
+    root.mainloop()
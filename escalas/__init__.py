@@ -0,0 +1,35 @@
+# Núcleo do sistema de escalas, sem interface gráfica: pode ser importado
+# por scripts, cron e testes. A interface Tk fica em calend.py e a linha de
+# comando em `python -m escalas`.
+from .cobertura import abaixo_do_minimo, cobertura_por_dia, ocupado
+from .copias import copias_periodicas, criar_copia, listar_copias, restaurar_copia
+from .db import apos_commit, caminho_db, conexao, configurar, init_db, transacao
+from .datas import data_exibicao, data_iso, intervalo_mes, intervalo_mes_ano
+from .diario import desfazer, listar_operacoes, operacao, ultima_operacao
+from .escala import (
+    cadastrar_funcionario,
+    dias_por_padrao,
+    excluir_funcionario,
+    gerar_escala,
+    gerar_escalas,
+    listar_funcionarios,
+    listar_para_escala,
+    plantoes_previstos,
+    regenerar_incremental,
+    regenerar_mes,
+)
+from .exportar import exportar_planilha, ha_escalas
+from .feriados import feriado_em, feriados_do_ano
+from .importar import importar_trocas, ler_pedidos, ler_trocas
+from .relatorios import exportar_saldo_csv, saldo_horas
+from .sugestoes import sugerir_lote, sugerir_substitutos
+from .tarefas import Cancelado, Tarefa
+from .trocas import (
+    TrocaInvalida,
+    alterar_data_troca,
+    buscar_trocas,
+    listar_trocas,
+    registrar_troca,
+    registrar_trocas,
+)
+from .unidades import exportar_combinada, exportar_todas, gerar_todas
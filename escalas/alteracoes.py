@@ -0,0 +1,43 @@
+from datetime import date
+
+from . import cobertura, db
+
+# Quem grava em escalas/trocas avisa aqui, dentro da própria transação.
+# Cada mês tocado ganha uma nova versão em versoes_mes (a exportação usa
+# para reaproveitar o que já montou) e o índice de cobertura é corrigido
+# depois do COMMIT. A linha '*' muda quando nomes de funcionários mudam e
+# vale para todos os meses.
+TODOS = "*"
+
+SQL_INCREMENTAR = """
+    INSERT INTO versoes_mes (mes, versao) VALUES (?, 1)
+    ON CONFLICT (mes) DO UPDATE SET versao = versao + 1
+"""
+
+def _data(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+def meses(inicio, fim):
+    # "YYYY-MM" de cada mês do intervalo (ISO ou date)
+    inicio, fim = _data(inicio), _data(fim)
+    ano, mes = inicio.year, inicio.month
+    while (ano, mes) <= (fim.year, fim.month):
+        yield f"{ano:04d}-{mes:02d}"
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def versoes(inicio, fim):
+    # {mês: versão} do intervalo, mais a versão geral em TODOS; mês
+    # nunca alterado fica de fora (versão 0)
+    inicio, fim = _data(inicio), _data(fim)
+    return dict(db.conexao().execute("""
+        SELECT mes, versao FROM versoes_mes
+         WHERE mes BETWEEN ? AND ? OR mes = ?
+    """, (f"{inicio:%Y-%m}", f"{fim:%Y-%m}", TODOS)))
+
+def escalas_alteradas(inicio, fim):
+    db.conexao().executemany(SQL_INCREMENTAR, ((m,) for m in meses(inicio, fim)))
+    cobertura.invalidar(inicio, fim)
+
+def funcionario_removido(funcionario_id):
+    db.conexao().execute(SQL_INCREMENTAR, (TODOS,))
+    cobertura.invalidar_funcionario(funcionario_id)
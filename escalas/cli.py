@@ -0,0 +1,337 @@
+import argparse
+import sys
+from datetime import datetime
+
+from . import db, unidades
+from .cobertura import abaixo_do_minimo
+from .copias import criar_copia, listar_copias, restaurar_copia
+from .datas import data_exibicao, data_iso, intervalo_mes
+from .diario import desfazer, listar_operacoes
+from .escala import (
+    gerar_escalas,
+    listar_funcionarios,
+    listar_para_escala,
+    regenerar_incremental,
+    regenerar_mes,
+)
+from .exportar import exportar_planilha, ha_escalas
+from .importar import importar_trocas, ler_pedidos
+from .relatorios import CABECALHOS_SALDO, exportar_saldo_csv, linhas_saldo, saldo_horas
+from .sugestoes import sugerir_lote, sugerir_substitutos
+from .trocas import TrocaInvalida, registrar_troca, registrar_trocas
+
+def _mes_ano(valor):
+    try:
+        ref = datetime.strptime(valor, "%m/%Y")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mês/ano inválido: {valor!r} (use MM/YYYY)")
+    return ref.month, ref.year
+
+def _data(valor):
+    try:
+        return data_iso(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {valor!r} (use DD/MM/AAAA)")
+
+def _cmd_funcionarios(args):
+    for fid, nome, tipo in listar_funcionarios():
+        print(f"{fid}\t{nome}\t{tipo}")
+
+def _intervalo(args):
+    inicio, _ = intervalo_mes(*args.mes)
+    _, fim = intervalo_mes(*(args.ate or args.mes))
+    if fim < inicio:
+        sys.exit("erro: o fim do intervalo é anterior ao início")
+    return inicio, fim
+
+def _cmd_gerar(args):
+    inicio, fim = _intervalo(args)
+    if args.substituir:
+        n = regenerar_mes(inicio, fim)
+    else:
+        n = gerar_escalas(listar_para_escala(), inicio, fim)
+    print(f"{n} plantões gravados de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}.")
+
+def _cmd_atualizar(args):
+    inicio, fim = _intervalo(args)
+    inseridas, removidas, alteradas = regenerar_incremental(inicio, fim)
+    print(f"{inseridas} plantões incluídos, {removidas} removidos, {alteradas} alterados.")
+
+def _cmd_cobertura(args):
+    inicio, fim = _intervalo(args)
+    minimo = None
+    if args.minimo is not None:
+        minimo = {"12h": args.minimo, "12h noturno": args.minimo}
+    faltas = abaixo_do_minimo(inicio, fim, minimo)
+    for data, turno, pessoas, necessario in faltas:
+        print(f"{data_exibicao(data)}\t{turno}\t{pessoas}/{necessario}")
+    print(f"{len(faltas)} turnos abaixo do mínimo de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}.")
+
+def _cmd_troca(args):
+    try:
+        registrar_troca(args.original, args.substituto, args.data)
+    except TrocaInvalida as e:
+        sys.exit(f"erro: {e}")
+    print("Troca realizada com sucesso!")
+
+def _cmd_importar_trocas(args):
+    gravadas, erros = importar_trocas(args.arquivo)
+    for linha, erro in erros:
+        print(f"linha {linha}: {erro}", file=sys.stderr)
+    print(f"{gravadas} trocas registradas, {len(erros)} com erro.")
+    if erros:
+        sys.exit(1)
+
+def _cmd_sugerir(args):
+    try:
+        sugestoes = sugerir_substitutos(args.original, args.data, args.limite)
+    except TrocaInvalida as e:
+        sys.exit(f"erro: {e}")
+    for fid, nome, turno, trocas in sugestoes:
+        print(f"{fid}\t{nome}\t{turno}\t{trocas} trocas recentes")
+    if not sugestoes:
+        print("Nenhum substituto disponível.")
+
+def _cmd_sugerir_lote(args):
+    pedidos, erros = ler_pedidos(args.arquivo)
+    sugestoes = sugerir_lote(p[1:] for p in pedidos)
+    nomes = {fid: nome for fid, nome, _ in listar_funcionarios()}
+    trocas = []
+    for (linha, *_), (id_orig, data, id_sub, erro) in zip(pedidos, sugestoes):
+        if erro:
+            erros.append((linha, erro))
+            continue
+        trocas.append((linha, id_orig, id_sub, data))
+        print(f"{data_exibicao(data)}\t{nomes[id_orig]}\t{nomes[id_sub]}")
+    if args.aplicar:
+        gravadas, erros_lote = registrar_trocas(t[1:] for t in trocas)
+        erros += [(trocas[i][0], erro) for i, erro in erros_lote]
+        print(f"{gravadas} trocas registradas.")
+    erros.sort()
+    for linha, erro in erros:
+        print(f"linha {linha}: {erro}", file=sys.stderr)
+    print(f"{len(trocas)} substitutos sugeridos, {len(erros)} pedidos sem sugestão.")
+    if erros:
+        sys.exit(1)
+
+def _cmd_exportar(args):
+    inicio = fim = None
+    if args.mes:
+        inicio, fim = _intervalo(args)
+    if not ha_escalas(inicio, fim):
+        sys.exit("Não há escalas para exportar.")
+    exportar_planilha(args.arquivo, inicio, fim, args.saldo)
+    print(f"Planilha salva em {args.arquivo}")
+
+def _cmd_saldo(args):
+    inicio, fim = _intervalo(args)
+    if args.csv:
+        exportar_saldo_csv(args.csv, inicio, fim)
+        print(f"Saldo de horas salvo em {args.csv}")
+        return
+    print("\t".join(CABECALHOS_SALDO))
+    for linha in linhas_saldo(saldo_horas(inicio, fim)):
+        print("\t".join(map(str, linha)))
+
+def _cmd_historico(args):
+    for op, momento, descricao, linhas, desfeita in listar_operacoes(args.limite):
+        marca = " (desfeita)" if desfeita else ""
+        print(f"{op}\t{momento}\t{descricao}{marca}\t{linhas} linhas")
+
+def _cmd_desfazer(args):
+    try:
+        print(f"Desfeito: {desfazer()}")
+    except ValueError as e:
+        sys.exit(str(e))
+
+def _cmd_copia(args):
+    print(f"Cópia salva em {criar_copia(args.pasta)}")
+
+def _cmd_copias(args):
+    for path in listar_copias(args.pasta):
+        print(path)
+
+def _cmd_restaurar(args):
+    try:
+        anterior = restaurar_copia(args.arquivo)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Banco restaurado de {args.arquivo}; o estado anterior ficou em {anterior}")
+
+def _cmd_unidades(args):
+    for u in unidades.carregar(args.unidades):
+        print(f"{u['nome']}\t{u['banco']}\t{u['subdivisao']}\t{len(u['municipais'])} feriados municipais")
+
+def _relatar(erros):
+    for nome, erro in erros:
+        print(f"{nome}: erro: {erro}", file=sys.stderr)
+    if erros:
+        sys.exit(1)
+
+def _cmd_gerar_unidades(args):
+    inicio, fim = _intervalo(args)
+    feitas, erros = unidades.gerar_todas(unidades.carregar(args.unidades), inicio, fim,
+                                         args.substituir, args.processos)
+    for nome, n in sorted(feitas.items()):
+        print(f"{nome}: {n} plantões gravados.")
+    _relatar(erros)
+
+def _cmd_exportar_unidades(args):
+    inicio = fim = None
+    if args.mes:
+        inicio, fim = _intervalo(args)
+    lista = unidades.carregar(args.unidades)
+    if args.combinada:
+        try:
+            salva, erros = unidades.exportar_combinada(lista, args.destino, inicio, fim, args.processos)
+        except ValueError as e:
+            sys.exit(str(e))
+        if salva:
+            print(f"Planilha salva em {args.destino}")
+    else:
+        arquivos, erros = unidades.exportar_todas(lista, args.destino, inicio, fim, args.processos)
+        for nome, path in sorted(arquivos.items()):
+            print(f"{nome}: {path or 'sem escalas no período'}")
+    _relatar(erros)
+
+def criar_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m escalas",
+        description="Sistema de Escalas sem interface gráfica.")
+    parser.add_argument("--db", metavar="ARQUIVO",
+                        help="banco SQLite (padrão: $ESCALAS_DB ou escalas.db)")
+    parser.add_argument("--unidades", metavar="ARQUIVO",
+                        help="lista de unidades (padrão: $ESCALAS_UNIDADES ou unidades.json)")
+    parser.add_argument("--unidade", metavar="NOME",
+                        help="usa o banco e os feriados desta unidade")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("funcionarios", help="lista os funcionários cadastrados")
+    p.set_defaults(func=_cmd_funcionarios)
+
+    p = sub.add_parser("gerar", help="gera a escala de um mês ou intervalo de meses")
+    p.add_argument("mes", type=_mes_ano, help="MM/YYYY")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="último mês, MM/YYYY (opcional)")
+    p.add_argument("--substituir", action="store_true",
+                   help="apaga e gera novamente as escalas do intervalo")
+    p.set_defaults(func=_cmd_gerar)
+
+    p = sub.add_parser("atualizar",
+                       help="atualiza a escala do intervalo gravando só as diferenças e mantendo as trocas")
+    p.add_argument("mes", type=_mes_ano, help="MM/YYYY")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="último mês, MM/YYYY (opcional)")
+    p.set_defaults(func=_cmd_atualizar)
+
+    p = sub.add_parser("cobertura", help="lista os dias e turnos abaixo do mínimo de pessoas")
+    p.add_argument("mes", type=_mes_ano, help="MM/YYYY")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="último mês, MM/YYYY (opcional)")
+    p.add_argument("--minimo", type=int, metavar="N",
+                   help="mínimo por turno de 12h (padrão: 1)")
+    p.set_defaults(func=_cmd_cobertura)
+
+    p = sub.add_parser("troca", help="registra uma troca de plantão")
+    p.add_argument("original", type=int, help="id do funcionário original")
+    p.add_argument("substituto", type=int, help="id do substituto")
+    p.add_argument("data", type=_data, help="DD/MM/AAAA")
+    p.set_defaults(func=_cmd_troca)
+
+    p = sub.add_parser("importar-trocas",
+                       help="registra as trocas de um CSV ou XLSX (original, substituto, data)")
+    p.add_argument("arquivo", help="caminho do .csv ou .xlsx")
+    p.set_defaults(func=_cmd_importar_trocas)
+
+    p = sub.add_parser("sugerir", help="sugere substitutos para um plantão, do melhor ao pior")
+    p.add_argument("original", type=int, help="id do funcionário original")
+    p.add_argument("data", type=_data, help="DD/MM/AAAA")
+    p.add_argument("-n", dest="limite", type=int, default=10, help="quantos mostrar (padrão: 10)")
+    p.set_defaults(func=_cmd_sugerir)
+
+    p = sub.add_parser("sugerir-lote",
+                       help="sugere um substituto para cada pedido de um CSV ou XLSX (original, data)")
+    p.add_argument("arquivo", help="caminho do .csv ou .xlsx")
+    p.add_argument("--aplicar", action="store_true", help="registra as trocas sugeridas")
+    p.set_defaults(func=_cmd_sugerir_lote)
+
+    p = sub.add_parser("exportar", help="exporta as escalas para Excel")
+    p.add_argument("arquivo", help="caminho do .xlsx")
+    p.add_argument("mes", type=_mes_ano, nargs="?", help="só este mês, MM/YYYY (opcional)")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="até este mês, MM/YYYY (opcional)")
+    p.add_argument("--saldo", action="store_true",
+                   help="inclui a aba com o saldo de horas do período")
+    p.set_defaults(func=_cmd_exportar)
+
+    p = sub.add_parser("saldo",
+                       help="horas previstas, trabalhadas, trocas e feriados por funcionário")
+    p.add_argument("mes", type=_mes_ano, help="MM/YYYY")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="último mês, MM/YYYY (opcional)")
+    p.add_argument("--csv", metavar="ARQUIVO", help="grava em CSV em vez de mostrar")
+    p.set_defaults(func=_cmd_saldo)
+
+    p = sub.add_parser("historico", help="últimas operações do diário de alterações")
+    p.add_argument("-n", dest="limite", type=int, default=20, help="quantas mostrar (padrão: 20)")
+    p.set_defaults(func=_cmd_historico)
+
+    p = sub.add_parser("desfazer", help="desfaz a última operação do diário")
+    p.set_defaults(func=_cmd_desfazer)
+
+    p = sub.add_parser("copia", help="copia o banco (API de backup do SQLite)")
+    p.add_argument("--pasta", help="destino (padrão: copias/<banco> ao lado do banco)")
+    p.set_defaults(func=_cmd_copia)
+
+    p = sub.add_parser("copias", help="lista as cópias, da mais recente à mais antiga")
+    p.add_argument("--pasta", help="pasta das cópias (padrão: copias/<banco>)")
+    p.set_defaults(func=_cmd_copias)
+
+    p = sub.add_parser("restaurar", help="volta o banco ao estado de uma cópia")
+    p.add_argument("arquivo", help="caminho da cópia .db")
+    p.set_defaults(func=_cmd_restaurar)
+
+    p = sub.add_parser("unidades", help="lista as unidades configuradas")
+    p.set_defaults(func=_cmd_unidades, todas=True)
+
+    p = sub.add_parser("gerar-unidades",
+                       help="gera a escala de todas as unidades, em paralelo")
+    p.add_argument("mes", type=_mes_ano, help="MM/YYYY")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="último mês, MM/YYYY (opcional)")
+    p.add_argument("--substituir", action="store_true",
+                   help="apaga e gera novamente as escalas do intervalo")
+    p.add_argument("--processos", type=int, metavar="N", help="padrão: um por núcleo")
+    p.set_defaults(func=_cmd_gerar_unidades, todas=True)
+
+    p = sub.add_parser("exportar-unidades",
+                       help="exporta todas as unidades, em paralelo: uma planilha por unidade")
+    p.add_argument("destino", help="pasta das planilhas (ou o .xlsx, com --combinada)")
+    p.add_argument("mes", type=_mes_ano, nargs="?", help="só este mês, MM/YYYY (opcional)")
+    p.add_argument("ate", type=_mes_ano, nargs="?", help="até este mês, MM/YYYY (opcional)")
+    p.add_argument("--combinada", action="store_true",
+                   help="uma planilha só, com uma aba por unidade e turno")
+    p.add_argument("--processos", type=int, metavar="N", help="padrão: um por núcleo")
+    p.set_defaults(func=_cmd_exportar_unidades, todas=True)
+    return parser
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if args.db and args.unidade:
+        parser.error("use --db ou --unidade, não os dois")
+    if args.db:
+        db.configurar(args.db)
+    if getattr(args, "todas", False):
+        # cada unidade é aberta (e migrada) no próprio processo
+        try:
+            args.func(args)
+        except ValueError as e:
+            sys.exit(f"erro: {e}")
+        return
+    if args.unidade:
+        try:
+            lista = unidades.carregar(args.unidades)
+        except ValueError as e:
+            sys.exit(f"erro: {e}")
+        escolhida = [u for u in lista if u["nome"].casefold() == args.unidade.casefold()]
+        if not escolhida:
+            sys.exit(f"erro: unidade desconhecida: {args.unidade!r}")
+        unidades.ativar(escolhida[0])
+    else:
+        db.init_db()
+    args.func(args)
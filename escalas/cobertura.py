@@ -0,0 +1,184 @@
+import threading
+from datetime import date
+
+from . import db
+from .datas import intervalo_mes
+from .diagnostico import fase
+
+# Índice de cobertura em memória: espelho das linhas de escalas com
+# original = 1 (quem de fato trabalha no dia). Montado na primeira
+# consulta e corrigido dia a dia depois de cada COMMIT que mexe em escalas.
+# Gravações de outro processo (cron, linha de comando) não passam por
+# aqui: antes de cada leitura, se o PRAGMA data_version da conexão mudou,
+# os meses cuja versão em versoes_mes mudou são relidos.
+# o dia já vem como ordinal, como no modelo compacto (escalas.modelo)
+SQL_OCUPADOS = """
+    SELECT funcionario_id, CAST(julianday(data) - 1721424.5 AS INTEGER), turno
+      FROM escalas WHERE original = 1
+"""
+
+# mínimo de pessoas por turno; turnos fora daqui não são cobrados
+MINIMO_PADRAO = {"12h": 1, "12h noturno": 1}
+
+class IndiceCobertura:
+    def __init__(self):
+        self.ocupados = {}   # funcionario -> {ordinal do dia: turno}
+        self.contagem = {}   # (ordinal, turno) -> pessoas no turno
+        self.por_dia = {}    # ordinal -> [(funcionario, turno)]
+        self.turnos = set()
+
+    def adicionar(self, linhas):
+        # linhas: (funcionario, ordinal do dia, turno)
+        for fid, dia, turno in linhas:
+            self.ocupados.setdefault(fid, {})[dia] = turno
+            self.contagem[(dia, turno)] = self.contagem.get((dia, turno), 0) + 1
+            self.por_dia.setdefault(dia, []).append((fid, turno))
+            self.turnos.add(turno)
+
+    def _descontar(self, dia, turno):
+        n = self.contagem[(dia, turno)] - 1
+        if n:
+            self.contagem[(dia, turno)] = n
+        else:
+            del self.contagem[(dia, turno)]
+
+    def remover_dias(self, inicio, fim):
+        for dia in range(inicio, fim + 1):
+            for fid, turno in self.por_dia.pop(dia, ()):
+                self.ocupados[fid].pop(dia, None)
+                self._descontar(dia, turno)
+
+    def remover_funcionario(self, funcionario_id):
+        for dia in self.ocupados.pop(funcionario_id, ()):
+            restantes = []
+            for fid, turno in self.por_dia.get(dia, ()):
+                if fid == funcionario_id:
+                    self._descontar(dia, turno)
+                else:
+                    restantes.append((fid, turno))
+            self.por_dia[dia] = restantes
+
+# versão geral (alteracoes.TODOS): muda quando um funcionário sai
+TODOS = "*"
+
+_lock = threading.Lock()
+_estado = {"caminho": None, "indice": None, "versoes": {}}
+# (banco, data_version) visto pela conexão de cada thread na última leitura
+_visto = threading.local()
+
+def _montar(conn, caminho):
+    # versões lidas antes das linhas: o que mudar no meio aparece depois
+    versoes = dict(conn.execute("SELECT mes, versao FROM versoes_mes"))
+    novo = IndiceCobertura()
+    with fase("índice de cobertura"):
+        novo.adicionar(conn.execute(SQL_OCUPADOS))
+    _estado.update(caminho=caminho, indice=novo, versoes=versoes)
+
+def _conferir(conn, caminho):
+    # data_version só muda com COMMITs de outras conexões; aí compara as
+    # versões dos meses com as do índice
+    marca = (caminho, conn.execute("PRAGMA data_version").fetchone()[0])
+    if getattr(_visto, "marca", None) == marca:
+        return
+    _visto.marca = marca
+    atuais = dict(conn.execute("SELECT mes, versao FROM versoes_mes"))
+    anteriores = _estado["versoes"]
+    if atuais == anteriores:
+        return
+    if atuais.get(TODOS) != anteriores.get(TODOS):
+        _montar(conn, caminho)
+        return
+    _estado["versoes"] = atuais
+    atual = _estado["indice"]
+    for mes in set(atuais) | set(anteriores):
+        if atuais.get(mes) != anteriores.get(mes):
+            inicio, fim = intervalo_mes(int(mes[5:]), int(mes[:4]))
+            _reler(conn, atual, inicio.isoformat(), fim.isoformat())
+
+def indice():
+    caminho = db.caminho_db()
+    conn = db.conexao()
+    with _lock:
+        if _estado["indice"] is None or _estado["caminho"] != caminho:
+            _montar(conn, caminho)
+            _visto.marca = (caminho, conn.execute("PRAGMA data_version").fetchone()[0])
+        else:
+            _conferir(conn, caminho)
+        return _estado["indice"]
+
+def descartar():
+    # o banco foi trocado por inteiro (restauração de cópia): a próxima
+    # consulta monta o índice de novo
+    with _lock:
+        _estado.update(caminho=None, indice=None)
+
+def _ordinal(data):
+    if isinstance(data, str):
+        data = date.fromisoformat(data)
+    return data.toordinal()
+
+def ocupado(funcionario_id, data):
+    # o funcionário já trabalha no dia? (data ISO ou date)
+    return _ordinal(data) in indice().ocupados.get(funcionario_id, ())
+
+def cobertura_por_dia(inicio, fim, turnos=None):
+    # [(data ISO, turno, pessoas)] de cada dia do intervalo
+    atual = indice()
+    if turnos is None:
+        turnos = sorted(atual.turnos | set(MINIMO_PADRAO))
+    return [
+        (date.fromordinal(dia).isoformat(), turno, atual.contagem.get((dia, turno), 0))
+        for dia in range(_ordinal(inicio), _ordinal(fim) + 1)
+        for turno in turnos
+    ]
+
+def abaixo_do_minimo(inicio, fim, minimo=None):
+    # [(data ISO, turno, pessoas, mínimo)] dos turnos descobertos
+    minimo = MINIMO_PADRAO if minimo is None else minimo
+    return [
+        (data, turno, n, minimo[turno])
+        for data, turno, n in cobertura_por_dia(inicio, fim, sorted(minimo))
+        if n < minimo[turno]
+    ]
+
+# --- atualização incremental, chamada por quem grava em escalas ---
+
+def _ativo():
+    return _estado["indice"] is not None and _estado["caminho"] == db.caminho_db()
+
+def _reler(conn, atual, inicio, fim):
+    linhas = conn.execute(SQL_OCUPADOS + " AND data BETWEEN ? AND ?", (inicio, fim))
+    atual.remover_dias(_ordinal(inicio), _ordinal(fim))
+    atual.adicionar(linhas)
+
+def recarregar(inicio, fim):
+    # relê já os dias do intervalo (ISO) e guarda as versões dos meses,
+    # para a próxima conferência não reler de novo
+    with _lock:
+        if not _ativo():
+            return
+        conn = db.conexao()
+        _estado["versoes"].update(conn.execute(
+            "SELECT mes, versao FROM versoes_mes WHERE mes BETWEEN ? AND ?",
+            (inicio[:7], fim[:7])))
+        _reler(conn, _estado["indice"], inicio, fim)
+
+def _remover(funcionario_id):
+    with _lock:
+        if _ativo():
+            _estado["indice"].remover_funcionario(funcionario_id)
+            # só a própria exclusão: se outro processo também mexeu na
+            # versão geral, a próxima conferência monta o índice de novo
+            versoes = _estado["versoes"]
+            geral = db.conexao().execute(
+                "SELECT versao FROM versoes_mes WHERE mes = ?", (TODOS,)).fetchone()
+            if geral and geral[0] == versoes.get(TODOS, 0) + 1:
+                versoes[TODOS] = geral[0]
+
+def invalidar(inicio, fim):
+    # os dias do intervalo (ISO ou date) são relidos depois do COMMIT
+    inicio, fim = str(inicio), str(fim)
+    db.apos_commit(lambda: recarregar(inicio, fim))
+
+def invalidar_funcionario(funcionario_id):
+    db.apos_commit(lambda: _remover(funcionario_id))
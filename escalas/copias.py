@@ -0,0 +1,116 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from . import cobertura, db
+
+# Cópias do banco pela API de backup do SQLite: uma leitura consistente do
+# arquivo inteiro que, em WAL, não trava quem grava. Ficam em
+# copias/<nome do banco>/AAAAMMDD-HHMMSS-mmm.db, ao lado do banco, e só as
+# MANTER_COPIAS mais recentes são guardadas.
+MANTER_COPIAS = 10
+INTERVALO_PADRAO = 30 * 60   # segundos entre cópias automáticas
+PAGINAS_POR_PASSO = 1024     # com tarefa, a cópia anda em passos de ~4 MB
+
+def pasta_padrao():
+    caminho = os.path.abspath(db.caminho_db())
+    nome = os.path.splitext(os.path.basename(caminho))[0]
+    return os.path.join(os.path.dirname(caminho), "copias", nome)
+
+def listar_copias(pasta=None):
+    # caminhos das cópias, da mais recente à mais antiga
+    pasta = pasta or pasta_padrao()
+    if not os.path.isdir(pasta):
+        return []
+    nomes = sorted((n for n in os.listdir(pasta) if n.endswith(".db")), reverse=True)
+    return [os.path.join(pasta, n) for n in nomes]
+
+def _backup(origem, alvo, tarefa, texto):
+    # sem tarefa, de uma vez; com tarefa, em passos que informam o
+    # progresso. Cancelar (Cancelado no callback) aborta a cópia
+    if tarefa is None:
+        origem.backup(alvo)
+        return
+    def progresso(_status, faltam, total):
+        tarefa.progresso(total - faltam, total, texto)
+    origem.backup(alvo, pages=PAGINAS_POR_PASSO, progress=progresso)
+
+def _copiar(pasta, tarefa=None):
+    # grava num temporário e renomeia: uma cópia interrompida nunca
+    # aparece na lista
+    os.makedirs(pasta, exist_ok=True)
+    agora = datetime.now()
+    destino = os.path.join(pasta, f"{agora:%Y%m%d-%H%M%S}-{agora.microsecond // 1000:03d}.db")
+    temporario = destino + ".tmp"
+    alvo = sqlite3.connect(temporario)
+    try:
+        _backup(db.conexao(), alvo, tarefa, "Copiando banco...")
+    except BaseException:
+        alvo.close()
+        os.remove(temporario)
+        raise
+    alvo.close()
+    os.replace(temporario, destino)
+    return destino
+
+def criar_copia(pasta=None, tarefa=None):
+    pasta = pasta or pasta_padrao()
+    destino = _copiar(pasta, tarefa)
+    for antiga in listar_copias(pasta)[MANTER_COPIAS:]:
+        os.remove(antiga)
+    return destino
+
+def restaurar_copia(path, tarefa=None):
+    # substitui o conteúdo do banco em uso pelo da cópia; antes guarda o
+    # estado atual numa cópia nova, então a restauração também se desfaz.
+    # Devolve o caminho dessa cópia
+    if not os.path.isfile(path):
+        raise ValueError(f"Cópia não encontrada: {path}")
+    anterior = _copiar(pasta_padrao(), tarefa)
+    origem = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        # interrompida, a restauração é desfeita e o banco fica como estava
+        _backup(origem, db.conexao(), tarefa, "Restaurando cópia...")
+    finally:
+        origem.close()
+    # cópia de uma versão antiga do esquema
+    with db.transacao() as c:
+        db.migrar_db(c)
+    # os caches do processo descrevem o banco de antes
+    cobertura.descartar()
+    from .exportar import limpar_fragmentos
+    limpar_fragmentos()
+    return anterior
+
+def _marca():
+    # muda sempre que o banco muda (o WAL recebe as gravações)
+    caminho = db.caminho_db()
+    marca = [caminho]
+    for arquivo in (caminho, caminho + "-wal"):
+        try:
+            info = os.stat(arquivo)
+            marca += [info.st_mtime_ns, info.st_size]
+        except OSError:
+            marca += [None, None]
+    return marca
+
+def copias_periodicas(intervalo=INTERVALO_PADRAO, pasta=None):
+    # thread em segundo plano, com conexão própria; só copia se o banco
+    # mudou desde a última cópia. Devolve um Event que encerra o laço
+    parar = threading.Event()
+
+    def laco():
+        ultima = None
+        while not parar.wait(intervalo):
+            marca = _marca()
+            if marca == ultima:
+                continue
+            try:
+                criar_copia(pasta)
+            except (OSError, sqlite3.Error):
+                continue   # tenta de novo no próximo intervalo
+            ultima = _marca()
+
+    threading.Thread(target=laco, daemon=True).start()
+    return parar
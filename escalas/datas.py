@@ -0,0 +1,22 @@
+import calendar
+from datetime import date, datetime
+
+# No banco as datas ficam em ISO (YYYY-MM-DD); na interface, DD/MM/AAAA.
+def data_iso(data_txt):
+    return datetime.strptime(data_txt, "%d/%m/%Y").date().isoformat()
+
+def data_exibicao(data_iso):
+    return f"{data_iso[8:10]}/{data_iso[5:7]}/{data_iso[:4]}"
+
+def intervalo_mes(mes, ano):
+    _, dias_no_mes = calendar.monthrange(ano, mes)
+    return date(ano, mes, 1), date(ano, mes, dias_no_mes)
+
+def intervalo_mes_ano(mes_ano):
+    # "MM/YYYY" -> (primeiro, último dia); vazio = mês atual
+    if mes_ano:
+        mes, ano = map(int, mes_ano.split("/"))
+    else:
+        hoje = datetime.now()
+        mes, ano = hoje.month, hoje.year
+    return intervalo_mes(mes, ano)
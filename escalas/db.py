@@ -0,0 +1,265 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Caminho do banco: variável de ambiente ESCALAS_DB ou configurar()
+CAMINHO_PADRAO = "escalas.db"
+_config = {"caminho": os.environ.get("ESCALAS_DB", CAMINHO_PADRAO)}
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",     # ~16 MB de páginas em cache
+    "PRAGMA mmap_size = 268435456",   # 256 MB mapeados
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Uma conexão longa por thread: a interface usa a sua e cada worker em
+# segundo plano abre a própria na primeira chamada
+_local = threading.local()
+
+# classe das conexões novas; escalas.diagnostico troca por uma que
+# cronometra os cursores. O padrão é a conexão do sqlite3, sem custo
+_fabrica = {"classe": sqlite3.Connection}
+
+def configurar(caminho):
+    _config["caminho"] = caminho
+
+def caminho_db():
+    return _config["caminho"]
+
+def definir_fabrica(classe):
+    _fabrica["classe"] = classe
+
+def _abrir(caminho):
+    conn = sqlite3.connect(caminho, timeout=10, cached_statements=256,
+                           factory=_fabrica["classe"])
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def conexao():
+    caminho = _config["caminho"]
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.caminho != caminho:
+        if conn is not None:
+            conn.close()
+        conn = _abrir(caminho)
+        _local.conn, _local.caminho, _local.nivel = conn, caminho, 0
+        _local.pendentes = []
+    return conn
+
+def fechar():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transacao():
+    # só o bloco mais externo faz COMMIT/ROLLBACK; blocos aninhados
+    # participam da mesma transação
+    conn = conexao()
+    externo = _local.nivel == 0
+    if externo:
+        conn.execute("BEGIN IMMEDIATE")
+    _local.nivel += 1
+    try:
+        yield conn.cursor()
+    except BaseException:
+        _local.nivel -= 1
+        if externo:
+            conn.rollback()
+            _local.pendentes.clear()
+        raise
+    _local.nivel -= 1
+    if externo:
+        conn.commit()
+        pendentes, _local.pendentes = _local.pendentes, []
+        for funcao in pendentes:
+            funcao()
+
+def apos_commit(funcao):
+    # agenda funcao para depois do COMMIT da transação em andamento (é
+    # descartada no ROLLBACK); fora de transação roda na hora
+    conexao()
+    if _local.nivel == 0:
+        funcao()
+    else:
+        _local.pendentes.append(funcao)
+
+# --- Esquema ---
+def init_db():
+    with transacao() as c:
+        _criar_tabelas(c)
+        migrar_db(c)
+
+def _criar_tabelas(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS funcionarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            tipo TEXT NOT NULL CHECK(tipo IN ('12x36','estagiario')),
+            escala_dias TEXT CHECK(escala_dias IN ('pares','ímpares')),
+            turno TEXT CHECK(turno IN ('12h','12h noturno','6h'))
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS escalas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            funcionario_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            turno TEXT NOT NULL,
+            original BOOLEAN DEFAULT 1,
+            FOREIGN KEY(funcionario_id) REFERENCES funcionarios(id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS trocas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data TEXT NOT NULL,
+            funcionario_original INTEGER NOT NULL,
+            funcionario_substituto INTEGER NOT NULL,
+            FOREIGN KEY(funcionario_original) REFERENCES funcionarios(id),
+            FOREIGN KEY(funcionario_substituto) REFERENCES funcionarios(id)
+        )
+    """)
+
+# --- Migrações de esquema (PRAGMA user_version) ---
+def _migracao_datas_iso(c):
+    # DD/MM/YYYY -> YYYY-MM-DD: ordenável e consultável por intervalo
+    for tabela in ("escalas", "trocas"):
+        c.execute(f"""
+            UPDATE {tabela}
+               SET data = substr(data, 7, 4) || '-' || substr(data, 4, 2) || '-' || substr(data, 1, 2)
+             WHERE data LIKE '__/__/____'
+        """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_escalas_data ON escalas(data)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_escalas_funcionario_data ON escalas(funcionario_id, data)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_escalas_turno_data ON escalas(turno, data)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_trocas_data_original ON trocas(data, funcionario_original)")
+
+def _migracao_escalas_unicas(c):
+    # compacta duplicatas (mesmo funcionário, data e turno) mantendo a
+    # linha mais antiga; se alguma cópia já foi trocada, fica original = 0
+    c.execute("""
+        UPDATE escalas
+           SET original = (SELECT MIN(d.original) FROM escalas d
+                            WHERE d.funcionario_id = escalas.funcionario_id
+                              AND d.data = escalas.data
+                              AND d.turno = escalas.turno)
+         WHERE id IN (SELECT MIN(id) FROM escalas
+                       GROUP BY funcionario_id, data, turno
+                      HAVING COUNT(*) > 1)
+    """)
+    c.execute("""
+        DELETE FROM escalas
+         WHERE id NOT IN (SELECT MIN(id) FROM escalas
+                           GROUP BY funcionario_id, data, turno)
+    """)
+    c.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_escalas_funcionario_data_turno
+            ON escalas(funcionario_id, data, turno)
+    """)
+    # o índice único cobre as buscas por (funcionario_id, data)
+    c.execute("DROP INDEX IF EXISTS idx_escalas_funcionario_data")
+
+def _migracao_feriados(c):
+    # cache do calendário de feriados (ver feriados.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS feriados (
+            ano INTEGER NOT NULL,
+            assinatura TEXT NOT NULL,
+            data TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            PRIMARY KEY (ano, data)
+        )
+    """)
+
+def _migracao_indice_trocas(c):
+    # (data, id): paginação do histórico de trocas sem ordenar em memória
+    c.execute("CREATE INDEX IF NOT EXISTS idx_trocas_data ON trocas(data)")
+
+def _migracao_versoes_mes(c):
+    # contador de alterações por mês "YYYY-MM" (ver alteracoes.py)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS versoes_mes (
+            mes TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def _migracao_indice_data_cobertura(c):
+    # substitui escalas(data) por um índice que cobre as leituras por
+    # intervalo (exportação, saldo de horas, cobertura): nenhuma volta à
+    # tabela, e o custo de escrita é o mesmo de antes
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_escalas_data_cobertura
+            ON escalas(data, funcionario_id, turno, original)
+    """)
+    c.execute("DROP INDEX IF EXISTS idx_escalas_data")
+
+# colunas guardadas no diário, na ordem do array JSON de cada linha
+COLUNAS_DIARIO = {
+    "funcionarios": ("id", "nome", "tipo", "escala_dias", "turno"),
+    "escalas": ("id", "funcionario_id", "data", "turno", "original"),
+    "trocas": ("id", "data", "funcionario_original", "funcionario_substituto"),
+}
+
+def _migracao_diario(c):
+    # diário de alterações (ver diario.py): cada operação é uma linha em
+    # diario e os gatilhos anotam, na mesma transação, cada linha que ela
+    # mexe. Inserida guarda só o id; alterada ou apagada guarda a versão
+    # anterior. Fora de uma operação aberta os gatilhos não gravam nada
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS diario (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            momento TEXT NOT NULL,
+            descricao TEXT NOT NULL,
+            aberta INTEGER,
+            desfaz INTEGER,
+            desfeita INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_diario_aberta ON diario(aberta) WHERE aberta = 1")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS diario_linhas (
+            id INTEGER PRIMARY KEY,
+            operacao INTEGER NOT NULL,
+            tabela TEXT NOT NULL,
+            linha INTEGER NOT NULL,
+            antes TEXT
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_diario_linhas_operacao ON diario_linhas(operacao)")
+    for tabela, colunas in COLUNAS_DIARIO.items():
+        antes = "json_array(" + ", ".join(f"OLD.{col}" for col in colunas) + ")"
+        for evento, linha, valor in (("INSERT", "NEW.id", "NULL"),
+                                     ("UPDATE", "OLD.id", antes),
+                                     ("DELETE", "OLD.id", antes)):
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS diario_{tabela}_{evento.lower()}
+                AFTER {evento} ON {tabela}
+                BEGIN
+                    INSERT INTO diario_linhas (operacao, tabela, linha, antes)
+                    SELECT id, '{tabela}', {linha}, {valor} FROM diario WHERE aberta = 1;
+                END
+            """)
+
+MIGRACOES = [
+    _migracao_datas_iso,      # 1
+    _migracao_escalas_unicas, # 2
+    _migracao_feriados,       # 3
+    _migracao_indice_trocas,  # 4
+    _migracao_versoes_mes,    # 5
+    _migracao_indice_data_cobertura,  # 6
+    _migracao_diario,         # 7
+]
+
+def migrar_db(c):
+    versao = c.execute("PRAGMA user_version").fetchone()[0]
+    for numero, migracao in enumerate(MIGRACOES[versao:], start=versao + 1):
+        migracao(c)
+        c.execute(f"PRAGMA user_version = {numero}")
+
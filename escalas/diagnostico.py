@@ -0,0 +1,226 @@
+import functools
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from . import db
+
+# Instrumentação opcional. Com ESCALAS_DIAGNOSTICO=<arquivo de log> cada
+# operação de alto nível (cadastrar, realizar_troca, editar_troca,
+# atualizar_escala, exportar...) registra quantos comandos SQL rodou, os
+# mais lentos com o plano (EXPLAIN QUERY PLAN) e o tempo de cada fase da
+# exportação. Desligado, os decoradores devolvem a própria função,
+# fase() é um nullcontext e as conexões são as do sqlite3: nenhum custo
+# por comando.
+CAMINHO_LOG = os.environ.get("ESCALAS_DIAGNOSTICO") or None
+ATIVO = CAMINHO_LOG is not None
+
+LENTOS_POR_OPERACAO = 5
+_recentes = deque(maxlen=50)
+_lock = threading.Lock()
+_local = threading.local()
+
+class _Registro:
+    def __init__(self, nome):
+        self.nome = nome
+        self.inicio = datetime.now()
+        self.segundos = 0.0
+        self.comandos = 0
+        self.fases = {}
+        self.lentos = []        # heap de (segundos, n, sql)
+        self._abertos = {}      # n -> [segundos, n, sql] de cursores ainda em uso
+
+    def abrir(self, sql):
+        self.comandos += 1
+        medida = self._abertos[self.comandos] = [0.0, self.comandos, sql]
+        return medida
+
+    def fechar(self, medida):
+        if self._abertos.pop(medida[1], None) is None:
+            return
+        item = tuple(medida)
+        if len(self.lentos) < LENTOS_POR_OPERACAO:
+            heapq.heappush(self.lentos, item)
+        elif item > self.lentos[0]:
+            heapq.heapreplace(self.lentos, item)
+
+    def fechar_todos(self):
+        for medida in list(self._abertos.values()):
+            self.fechar(medida)
+
+class _Cursor(sqlite3.Cursor):
+    # a duração de um comando é a soma do execute com os fetch do mesmo
+    # cursor; o Python que roda entre eles não conta
+    _registro = _medida = None
+
+    def _encerrar(self):
+        if self._medida is not None:
+            self._registro.fechar(self._medida)
+            self._registro = self._medida = None
+
+    def _executar(self, metodo, sql, *args):
+        self._encerrar()
+        registro = getattr(_local, "registro", None)
+        if registro is None:
+            return metodo(sql, *args)
+        medida = registro.abrir(sql)
+        self._registro, self._medida = registro, medida
+        _local.expandido = None
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, *args)
+        finally:
+            medida[0] += time.perf_counter() - inicio
+            # o texto com os valores, para o EXPLAIN QUERY PLAN
+            medida[2] = _local.expandido or sql
+
+    def _buscar(self, metodo, *args):
+        medida = self._medida
+        if medida is None:
+            return metodo(*args)
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args)
+        finally:
+            medida[0] += time.perf_counter() - inicio
+
+    def execute(self, sql, *args):
+        return self._executar(super().execute, sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._executar(super().executemany, sql, *args)
+
+    def executescript(self, sql):
+        return self._executar(super().executescript, sql)
+
+    def fetchone(self):
+        linha = self._buscar(super().fetchone)
+        if linha is None:
+            self._encerrar()
+        return linha
+
+    def fetchmany(self, *args):
+        return self._buscar(super().fetchmany, *args)
+
+    def fetchall(self):
+        linhas = self._buscar(super().fetchall)
+        self._encerrar()
+        return linhas
+
+    def __next__(self):
+        try:
+            return self._buscar(super().__next__)
+        except StopIteration:
+            self._encerrar()
+            raise
+
+    def close(self):
+        self._encerrar()
+        super().close()
+
+    def __del__(self):
+        self._encerrar()
+
+def _rastrear(sql):
+    # guarda o primeiro comando que o SQLite expande (os seguintes podem
+    # ser os gatilhos ou as outras linhas de um executemany)
+    if getattr(_local, "expandido", "") is None and not sql.startswith("--"):
+        _local.expandido = sql
+
+class _Conexao(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_rastrear)
+
+    # conn.execute() também passa por cursor()
+    def cursor(self, factory=_Cursor):
+        return super().cursor(factory)
+
+def _planos(lentos):
+    # roda depois que a operação terminou: os EXPLAIN não são medidos
+    conn = db.conexao()
+    resultado = []
+    for segundos, _, sql in sorted(lentos, reverse=True):
+        plano = []
+        if sql.split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            try:
+                plano = [linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+            except sqlite3.Error as e:
+                plano = [f"(sem plano: {e})"]
+        resultado.append((segundos, sql, plano))
+    return resultado
+
+def formatar(r):
+    linhas = [f"[{r['inicio']:%Y-%m-%d %H:%M:%S}] {r['nome']}: {r['segundos']:.3f}s, "
+              f"{r['comandos']} comandos SQL"]
+    for fase, segundos in r["fases"].items():
+        linhas.append(f"    fase {fase}: {segundos:.3f}s")
+    for segundos, sql, plano in r["lentos"]:
+        linhas.append(f"    {segundos:.4f}s  {' '.join(sql.split())[:300]}")
+        linhas.extend(f"        {passo}" for passo in plano)
+    return "\n".join(linhas)
+
+def _concluir(registro):
+    registro.fechar_todos()
+    r = {
+        "nome": registro.nome,
+        "inicio": registro.inicio,
+        "segundos": registro.segundos,
+        "comandos": registro.comandos,
+        "fases": registro.fases,
+        "lentos": _planos(registro.lentos),
+    }
+    texto = formatar(r)
+    with _lock:
+        _recentes.append(r)
+        with open(CAMINHO_LOG, "a", encoding="utf-8") as f:
+            f.write(texto + "\n")
+
+def medir(nome):
+    # decorador das operações de alto nível; chamadas aninhadas contam
+    # para a operação mais externa
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if getattr(_local, "registro", None) is not None:
+                return funcao(*args, **kwargs)
+            registro = _local.registro = _Registro(nome)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                registro.segundos = time.perf_counter() - inicio
+                _local.registro = None
+                _concluir(registro)
+        return medida
+    return decorador
+
+@contextmanager
+def _fase(nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro = getattr(_local, "registro", None)
+        if registro is not None:
+            registro.fases[nome] = registro.fases.get(nome, 0.0) + time.perf_counter() - inicio
+
+def fase(nome):
+    # cronômetro de uma etapa dentro da operação atual (acumula se repetir)
+    return _fase(nome) if ATIVO else nullcontext()
+
+def recentes():
+    # cópia das últimas operações medidas, da mais antiga para a mais nova
+    with _lock:
+        return list(_recentes)
+
+if ATIVO:
+    db.definir_fabrica(_Conexao)
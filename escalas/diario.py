@@ -0,0 +1,124 @@
+import json
+from contextlib import contextmanager
+from itertools import groupby
+
+from .alteracoes import escalas_alteradas, funcionario_removido
+from .db import COLUNAS_DIARIO, conexao, transacao
+
+# Diário de alterações. Quem grava em funcionarios/escalas/trocas abre uma
+# operacao(); os gatilhos da migração 7 anotam cada linha mexida na mesma
+# transação, então um crash não deixa operação pela metade nem diário sem
+# a alteração correspondente. desfazer() reverte a última operação,
+# também como uma operação do diário.
+MANTER_OPERACOES = 100
+
+SQL_ABERTA = "SELECT id FROM diario WHERE aberta = 1"
+
+# dias mexidos pela operação: os das versões anteriores e os das linhas
+# que ela inseriu (ainda no banco, já que é a última)
+SQL_DATAS = """
+    SELECT MIN(d), MAX(d) FROM (
+        SELECT json_extract(l.antes, CASE l.tabela WHEN 'escalas' THEN '$[2]' ELSE '$[1]' END) d
+          FROM diario_linhas l
+         WHERE l.operacao = :op AND l.tabela IN ('escalas', 'trocas') AND l.antes IS NOT NULL
+        UNION ALL
+        SELECT e.data FROM diario_linhas l JOIN escalas e ON e.id = l.linha
+         WHERE l.operacao = :op AND l.tabela = 'escalas' AND l.antes IS NULL
+        UNION ALL
+        SELECT t.data FROM diario_linhas l JOIN trocas t ON t.id = l.linha
+         WHERE l.operacao = :op AND l.tabela = 'trocas' AND l.antes IS NULL
+    )
+"""
+
+@contextmanager
+def operacao(descricao):
+    # transação registrada no diário; dentro de outra operação só participa
+    # dela (regenerar_mes chama gerar_escalas, por exemplo)
+    with transacao() as c:
+        if c.execute(SQL_ABERTA).fetchone():
+            yield c
+            return
+        c.execute("""
+            INSERT INTO diario (momento, descricao, aberta)
+            VALUES (datetime('now', 'localtime'), ?, 1)
+        """, (descricao,))
+        _podar(c, c.lastrowid)
+        yield c
+        c.execute("UPDATE diario SET aberta = NULL WHERE aberta = 1")
+
+def _podar(c, atual):
+    limite = atual - MANTER_OPERACOES
+    if limite > 0:
+        c.execute("DELETE FROM diario_linhas WHERE operacao <= ?", (limite,))
+        c.execute("DELETE FROM diario WHERE id <= ?", (limite,))
+
+def listar_operacoes(limite=20):
+    # [(id, momento, descrição, linhas, desfeita)] da mais recente à mais antiga
+    return conexao().execute("""
+        SELECT d.id, d.momento, d.descricao,
+               (SELECT COUNT(*) FROM diario_linhas l WHERE l.operacao = d.id),
+               d.desfeita
+          FROM diario d
+         ORDER BY d.id DESC
+         LIMIT ?
+    """, (limite,)).fetchall()
+
+def ultima_operacao():
+    # (id, momento, descrição) da operação que desfazer() reverteria, ou None
+    return conexao().execute("""
+        SELECT id, momento, descricao FROM diario
+         WHERE desfeita = 0 AND desfaz IS NULL AND aberta IS NULL
+         ORDER BY id DESC LIMIT 1
+    """).fetchone()
+
+def desfazer(tarefa=None):
+    # reverte a última operação não desfeita, da última alteração para a
+    # primeira; devolve a descrição dela
+    with transacao() as c:
+        ultima = ultima_operacao()
+        if ultima is None:
+            raise ValueError("Não há operação para desfazer.")
+        op, _, descricao = ultima
+        inicio, fim = c.execute(SQL_DATAS, {"op": op}).fetchone()
+        linhas = c.execute("""
+            SELECT tabela, linha, antes FROM diario_linhas
+             WHERE operacao = ? ORDER BY id DESC
+        """, (op,)).fetchall()
+        with operacao(f"Desfazer: {descricao}"):
+            c.execute("UPDATE diario SET desfaz = ? WHERE aberta = 1", (op,))
+            # trechos seguidos da mesma tabela e do mesmo tipo vão num
+            # executemany só, sem mudar a ordem
+            feitas = 0
+            removidos = []
+            for (tabela, inserida), trecho in groupby(
+                    linhas, key=lambda l: (l[0], l[2] is None)):
+                trecho = list(trecho)
+                if inserida:
+                    c.executemany(f"DELETE FROM {tabela} WHERE id = ?",
+                                  ((linha,) for _, linha, _ in trecho))
+                    if tabela == "funcionarios":
+                        removidos += [linha for _, linha, _ in trecho]
+                else:
+                    # vale a versão mais antiga de cada linha (a última do
+                    # trecho). Apagar e inserir, em vez de INSERT OR
+                    # REPLACE, passa pelos gatilhos: o diário guarda a
+                    # versão atual e o desfazer também se desfaz
+                    versoes = {linha: antes for _, linha, antes in trecho}
+                    colunas = COLUNAS_DIARIO[tabela]
+                    c.executemany(f"DELETE FROM {tabela} WHERE id = ?",
+                                  ((linha,) for linha in versoes))
+                    c.executemany(f"""
+                        INSERT INTO {tabela} ({", ".join(colunas)})
+                        VALUES ({", ".join("?" * len(colunas))})
+                    """, (json.loads(antes) for antes in versoes.values()))
+                feitas += len(trecho)
+                if tarefa:
+                    tarefa.progresso(feitas, len(linhas), "Desfazendo...")
+            c.execute("UPDATE diario SET desfeita = 1 WHERE id = ?", (op,))
+            # funcionários antes das datas: o índice de cobertura tira quem
+            # saiu e depois relê os dias, já com as escalas de volta
+            for fid in removidos:
+                funcionario_removido(fid)
+            if inicio is not None:
+                escalas_alteradas(inicio, fim)
+    return descricao
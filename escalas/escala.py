@@ -0,0 +1,140 @@
+from datetime import date
+
+from .alteracoes import escalas_alteradas, funcionario_removido
+from .datas import intervalo_mes_ano
+from .db import conexao, transacao
+from .diagnostico import medir
+from .diario import operacao
+
+def listar_funcionarios():
+    return conexao().execute("SELECT id, nome, tipo FROM funcionarios ORDER BY nome").fetchall()
+
+def listar_para_escala():
+    return conexao().execute("SELECT id, tipo, escala_dias, turno FROM funcionarios").fetchall()
+
+@medir("cadastrar")
+def cadastrar_funcionario(nome, tipo, escala_dias, turno, mes_ano):
+    with operacao(f"Cadastro de {nome}") as c:
+        c.execute("""
+            INSERT INTO funcionarios (nome, tipo, escala_dias, turno)
+            VALUES (?, ?, ?, ?)
+        """, (nome, tipo, escala_dias, turno))
+        fid = c.lastrowid
+        gerar_escala(fid, tipo, escala_dias, turno, mes_ano)
+    return fid
+
+def gerar_escala(funcionario_id, tipo, escala_dias, turno, mes_ano):
+    try:
+        inicio, fim = intervalo_mes_ano(mes_ano)
+    except:
+        return
+    gerar_escalas([(funcionario_id, tipo, escala_dias, turno)], inicio, fim)
+
+def dias_por_padrao(inicio, fim):
+    # percorre o intervalo uma única vez e separa as datas (ISO) de cada
+    # padrão de escala: 12x36 pares/ímpares e estagiário (segunda a sexta)
+    padroes = {"pares": [], "ímpares": [], "estagiario": []}
+    for ordinal in range(inicio.toordinal(), fim.toordinal() + 1):
+        dia = date.fromordinal(ordinal)
+        iso = dia.isoformat()
+        padroes["pares" if dia.day % 2 == 0 else "ímpares"].append(iso)
+        if dia.weekday() < 5:
+            padroes["estagiario"].append(iso)
+    return padroes
+
+def plantoes_previstos(funcionarios, inicio, fim):
+    # (funcionario_id, data, turno) de cada plantão do padrão no intervalo;
+    # funcionarios: (id, tipo, escala_dias, turno), como em listar_para_escala()
+    padroes = dias_por_padrao(inicio, fim)
+    return (
+        (fid, dia, turno)
+        for fid, tipo, escala_dias, turno in funcionarios
+        for dia in padroes.get(escala_dias if tipo == "12x36" else "estagiario", ())
+    )
+
+@medir("gerar_escalas")
+def gerar_escalas(funcionarios, inicio, fim):
+    linhas = plantoes_previstos(funcionarios, inicio, fim)
+    with operacao(f"Geração de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}") as c:
+        c.executemany("""
+            INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
+            VALUES (?, ?, ?, 1)
+        """, linhas)
+        escalas_alteradas(inicio, fim)
+        return c.rowcount
+
+@medir("excluir_funcionario")
+def excluir_funcionario(funcionario_id):
+    nome = conexao().execute("SELECT nome FROM funcionarios WHERE id = ?",
+                             (funcionario_id,)).fetchone()
+    descricao = f"Exclusão de {nome[0] if nome else funcionario_id}"
+    with operacao(descricao) as c:
+        c.execute("DELETE FROM funcionarios WHERE id = ?", (funcionario_id,))
+        c.execute("DELETE FROM escalas WHERE funcionario_id = ?", (funcionario_id,))
+        funcionario_removido(funcionario_id)
+
+@medir("regenerar_mes")
+def regenerar_mes(inicio, fim, tarefa=None):
+    # cancelar antes do fim desfaz tudo: a transação é uma só
+    with operacao(f"Regeneração de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}") as c:
+        c.execute("DELETE FROM escalas WHERE data BETWEEN ? AND ?", (inicio.isoformat(), fim.isoformat()))
+        if tarefa:
+            tarefa.progresso(1, 3, "Gerando escalas...")
+        inseridas = gerar_escalas(listar_para_escala(), inicio, fim)
+        if tarefa:
+            tarefa.progresso(2, 3, "Gravando...")
+    return inseridas
+
+@medir("atualizar_escala")
+def regenerar_incremental(inicio, fim, tarefa=None):
+    # compara a escala prevista (padrão + trocas registradas) com a gravada
+    # e só escreve a diferença; devolve (inseridas, removidas, alteradas)
+    ini, fi = inicio.isoformat(), fim.isoformat()
+    # a comparação e a gravação numa transação só; sem diferença nada é
+    # gravado, nem no diário, e as versões dos meses (caches) não mudam
+    with transacao() as c:
+        previstas = dict.fromkeys(plantoes_previstos(listar_para_escala(), inicio, fim), 1)
+        turnos = dict(c.execute("SELECT id, turno FROM funcionarios").fetchall())
+        # reaplica as trocas: original deixa de ser original, substituto entra
+        trocas = c.execute("""
+            SELECT data, funcionario_original, funcionario_substituto
+              FROM trocas
+             WHERE data BETWEEN ? AND ?
+        """, (ini, fi)).fetchall()
+        for data, id_orig, id_sub in trocas:
+            chave = (id_orig, data, turnos.get(id_orig))
+            if chave in previstas:
+                previstas[chave] = 0
+            if id_sub in turnos:
+                previstas.setdefault((id_sub, data, turnos[id_sub]), 1)
+        if tarefa:
+            tarefa.progresso(1, 3, "Comparando com a escala gravada...")
+
+        c.execute("""
+            SELECT id, funcionario_id, data, turno, original
+              FROM escalas
+             WHERE data BETWEEN ? AND ?
+        """, (ini, fi))
+        gravadas = {(fid, data, turno): (esc_id, original)
+                    for esc_id, fid, data, turno, original in c}
+        inserir = [(*k, original) for k, original in previstas.items() if k not in gravadas]
+        remover = [(esc_id,) for k, (esc_id, _) in gravadas.items() if k not in previstas]
+        alterar = [
+            (previstas[k], esc_id)
+            for k, (esc_id, original) in gravadas.items()
+            if k in previstas and previstas[k] != original
+        ]
+        if not (inserir or remover or alterar):
+            return 0, 0, 0
+        if tarefa:
+            tarefa.progresso(2, 3, "Gravando diferenças...")
+
+        with operacao(f"Atualização de {inicio:%d/%m/%Y} a {fim:%d/%m/%Y}"):
+            c.executemany("DELETE FROM escalas WHERE id = ?", remover)
+            c.executemany("UPDATE escalas SET original = ? WHERE id = ?", alterar)
+            c.executemany("""
+                INSERT INTO escalas (funcionario_id, data, turno, original)
+                VALUES (?, ?, ?, ?)
+            """, inserir)
+            escalas_alteradas(inicio, fim)
+    return len(inserir), len(remover), len(alterar)
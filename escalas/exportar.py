@@ -0,0 +1,300 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+
+from .alteracoes import TODOS, meses, versoes
+from .datas import intervalo_mes
+from .db import caminho_db, conexao
+from .diagnostico import fase, medir
+from .feriados import assinatura, feriado_em, feriados_do_ano
+from .modelo import ORIGINAL, SUBSTITUINDO
+from .modelo import carregar as carregar_modelo
+from .relatorios import CABECALHOS_SALDO, linhas_saldo, saldo_horas
+from .tarefas import Cancelado
+
+# Estilos de planilha (openpyxl só é importado quando há exportação)
+@lru_cache(maxsize=None)
+def estilos():
+    from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
+    header_fill   = PatternFill(start_color="ADD8E6", fill_type="solid")
+    holiday_fill  = PatternFill(start_color="FFF2CC", fill_type="solid")
+    bold_font     = Font(bold=True)
+    center_align  = Alignment(horizontal="center")
+    thin_border   = Border(left=Side('thin'), right=Side('thin'),
+                           top=Side('thin'), bottom=Side('thin'))
+    return header_fill, holiday_fill, bold_font, center_align, thin_border
+
+CABECALHOS = ["Funcionário", "Turno", "Data", "Feriado", "Substituído Por"]
+
+def carregar_feriados(inicio, fim):
+    # aquece o índice de feriados dos anos do intervalo antes de percorrer
+    # as linhas
+    for ano in range(inicio.year, fim.year + 1):
+        feriados_do_ano(ano)
+
+def linhas_modelo(modelo, posicoes, turnos):
+    # {turno: [linhas]} das posições do modelo; registros de substitutos
+    # (original = 1 cobrindo troca no dia) ficam de fora
+    codigos = {modelo.codigos_turno[t]: t for t in turnos if t in modelo.codigos_turno}
+    resultado = {turno: [] for turno in turnos}
+    por_codigo = {codigo: resultado[turno] for codigo, turno in codigos.items()}
+    dias, funcionarios, cod_turnos = modelo.dias, modelo.funcionarios, modelo.turnos
+    flags, substitutos, nomes = modelo.flags, modelo.substitutos, modelo.nomes
+    descartar = ORIGINAL | SUBSTITUINDO
+    # data exibida e feriado calculados uma vez por dia, não por linha
+    por_dia = {}
+    for i in posicoes:
+        destino = por_codigo.get(cod_turnos[i])
+        if destino is None or flags[i] == descartar:
+            continue
+        dia = dias[i]
+        exibicao = por_dia.get(dia)
+        if exibicao is None:
+            dt = date.fromordinal(dia)
+            exibicao = por_dia[dia] = (f"{dt.day:02d}/{dt.month:02d}/{dt.year}", feriado_em(dt))
+        sub = substitutos[i]
+        destino.append((nomes[funcionarios[i]], codigos[cod_turnos[i]], exibicao[0], exibicao[1],
+                        nomes.get(sub, "") if sub else ""))
+    return resultado
+
+def larguras_linhas(linhas):
+    larguras = [0] * len(CABECALHOS)
+    for linha in linhas:
+        for i, valor in enumerate(linha):
+            if len(valor) > larguras[i]:
+                larguras[i] = len(valor)
+    return larguras
+
+# Fragmentos: o modelo compacto de um mês inteiro (~14 bytes por plantão,
+# ver modelo.py) e, de cada turno, o total de linhas e a largura das
+# colunas. Valem enquanto a versão do mês (versoes_mes), a versão geral e
+# a assinatura dos feriados não mudarem; meses cortados pelo intervalo
+# pedido são lidos na hora, sem cache. As duas passadas da exportação
+# usam o mesmo modelo, e as linhas formatadas não ficam guardadas. O
+# limite é em plantões: 1.000.000 (~14 MB) cabem uns dez anos de 500
+# funcionários.
+MAX_PLANTOES_FRAGMENTOS = 1_000_000
+_fragmentos = OrderedDict()   # (banco, mês) -> (chave, modelo, {turno: (total, larguras)})
+_lock_fragmentos = threading.Lock()
+_guardados = {"plantoes": 0}
+
+def _fragmento_guardado(mes, chave):
+    ident = (caminho_db(), mes)
+    with _lock_fragmentos:
+        guardado = _fragmentos.get(ident)
+        if guardado and guardado[0] == chave:
+            _fragmentos.move_to_end(ident)
+            return guardado[1], guardado[2]
+    return None
+
+def _guardar_fragmento(mes, chave, modelo, resumo):
+    ident = (caminho_db(), mes)
+    with _lock_fragmentos:
+        anterior = _fragmentos.pop(ident, None)
+        if anterior:
+            _guardados["plantoes"] -= len(anterior[1])
+        _fragmentos[ident] = (chave, modelo, resumo)
+        _guardados["plantoes"] += len(modelo)
+        while _guardados["plantoes"] > MAX_PLANTOES_FRAGMENTOS:
+            _, (_, antigo, _) = _fragmentos.popitem(last=False)
+            _guardados["plantoes"] -= len(antigo)
+
+def limpar_fragmentos():
+    with _lock_fragmentos:
+        _fragmentos.clear()
+        _guardados["plantoes"] = 0
+
+def _resumo(modelo):
+    # {turno: (total de linhas, larguras)}; as linhas são montadas só para
+    # medir e descartadas
+    return {turno: (len(linhas), larguras_linhas(linhas))
+            for turno, linhas in linhas_modelo(modelo, range(len(modelo)), modelo.nomes_turno).items()}
+
+def planejar(c, turnos, inicio, fim, tarefa=None):
+    # primeira passada, um mês por vez: as planilhas write-only gravam as
+    # larguras antes das linhas. Devolve (meses, {turno: larguras},
+    # {turno: total de linhas}); meses = [(mês, início, fim, chave ou None,
+    # modelo ou None)] para linhas_turno(). O modelo só vai junto quando
+    # não ficou no cache (mês cortado ou maior que o limite)
+    with fase("feriados"):
+        carregar_feriados(inicio, fim)
+    with fase("fragmentos"):
+        versoes_atuais = versoes(inicio, fim)
+        feriados = assinatura()
+        plano = []
+        larguras = {turno: [len(h) for h in CABECALHOS] for turno in turnos}
+        totais = dict.fromkeys(turnos, 0)
+        todos = list(meses(inicio, fim))
+        for n, mes in enumerate(todos):
+            if tarefa:
+                tarefa.progresso(n, len(todos), f"Preparando linhas ({mes})...")
+            ini_mes, fim_mes = intervalo_mes(int(mes[5:]), int(mes[:4]))
+            chave = None
+            if ini_mes >= inicio and fim_mes <= fim:
+                chave = (versoes_atuais.get(mes, 0), versoes_atuais.get(TODOS, 0), feriados)
+            ini_mes, fim_mes = max(ini_mes, inicio), min(fim_mes, fim)
+            guardado = None if chave is None else _fragmento_guardado(mes, chave)
+            if guardado is not None:
+                modelo, resumo = guardado
+                plano.append((mes, ini_mes, fim_mes, chave, None))
+            else:
+                modelo = carregar_modelo(ini_mes, fim_mes, c)
+                resumo = _resumo(modelo)
+                if chave is not None and len(modelo) <= MAX_PLANTOES_FRAGMENTOS:
+                    _guardar_fragmento(mes, chave, modelo, resumo)
+                    plano.append((mes, ini_mes, fim_mes, chave, None))
+                else:
+                    plano.append((mes, ini_mes, fim_mes, chave, modelo))
+            for turno in turnos:
+                total, parte = resumo.get(turno, (0, ()))
+                larguras[turno] = [max(a, b) for a, b in zip(larguras[turno], parte)] if total else larguras[turno]
+                totais[turno] += total
+    return plano, {t: [largura + 2 for largura in larguras[t]] for t in turnos}, totais
+
+def linhas_turno(c, turno, plano):
+    # segunda passada: as linhas do turno, um mês por vez, montadas do
+    # modelo que a primeira passada deixou no cache. Só um intervalo maior
+    # que o limite do cache faz ler algum mês de novo (sem guardar: tiraria
+    # os meses que os próximos turnos ainda vão ler)
+    for mes, ini_mes, fim_mes, chave, modelo in plano:
+        if modelo is None:
+            guardado = _fragmento_guardado(mes, chave)
+            modelo = guardado[0] if guardado else carregar_modelo(ini_mes, fim_mes, c)
+        yield from linhas_modelo(modelo, range(len(modelo)), [turno])[turno]
+
+def escrever_abas(wb, abas, tarefa=None):
+    # abas: [(título, larguras, total de linhas, linhas)] gravadas em wb
+    # (write-only), na ordem; linhas pode ser um gerador
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    header_fill, holiday_fill, bold_font, center_align, thin_border = estilos()
+
+    total = sum(aba[2] for aba in abas)
+    feitas = 0
+    try:
+        for titulo, larguras, _, linhas in abas:
+            ws = wb.create_sheet(title=titulo[:31])
+            for col_idx, largura in enumerate(larguras, start=1):
+                ws.column_dimensions[get_column_letter(col_idx)].width = largura
+
+            # células-modelo: cada estilo é montado uma vez e compartilhado
+            modelo_cabecalho = WriteOnlyCell(ws)
+            modelo_cabecalho.fill = header_fill
+            modelo_cabecalho.font = bold_font
+            modelo_cabecalho.alignment = center_align
+            modelo_cabecalho.border = thin_border
+            modelo_linha = WriteOnlyCell(ws)
+            modelo_linha.alignment = center_align
+            modelo_linha.border = thin_border
+            modelo_feriado = WriteOnlyCell(ws)
+            modelo_feriado.fill = holiday_fill
+            modelo_feriado.alignment = center_align
+            modelo_feriado.border = thin_border
+
+            def celulas(valores, modelo):
+                for valor in valores:
+                    cell = WriteOnlyCell(ws, value=valor)
+                    cell._style = modelo._style
+                    yield cell
+
+            ws.append(list(celulas(CABECALHOS, modelo_cabecalho)))
+            with fase("linhas (openpyxl)"):
+                for linha in linhas:
+                    # destaca linha de feriado
+                    ws.append(list(celulas(linha, modelo_feriado if linha[3] else modelo_linha)))
+                    feitas += 1
+                    if tarefa and feitas % 1000 == 0:
+                        tarefa.progresso(feitas, total, f"{titulo}: {feitas} de {total} linhas")
+        if tarefa:
+            tarefa.progresso(total, total, "Salvando planilha...")
+    except Cancelado:
+        # fecha as planilhas já abertas para liberar os arquivos temporários
+        for ws in wb.worksheets:
+            ws.close()
+        raise
+
+def escrever_saldo(wb, saldos, titulo="Saldo de Horas"):
+    # aba com o relatório de relatorios.saldo_horas
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+    header_fill, _, bold_font, center_align, thin_border = estilos()
+
+    linhas = list(linhas_saldo(saldos))
+    ws = wb.create_sheet(title=titulo[:31])
+    larguras = [len(h) for h in CABECALHOS_SALDO]
+    for linha in linhas:
+        larguras = [max(largura, len(str(valor))) for largura, valor in zip(larguras, linha)]
+    for col_idx, largura in enumerate(larguras, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = largura + 2
+
+    modelo_cabecalho = WriteOnlyCell(ws)
+    modelo_cabecalho.fill = header_fill
+    modelo_cabecalho.font = bold_font
+    modelo_cabecalho.alignment = center_align
+    modelo_cabecalho.border = thin_border
+    modelo_linha = WriteOnlyCell(ws)
+    modelo_linha.alignment = center_align
+    modelo_linha.border = thin_border
+
+    def celulas(valores, modelo):
+        for valor in valores:
+            cell = WriteOnlyCell(ws, value=valor)
+            cell._style = modelo._style
+            yield cell
+
+    ws.append(list(celulas(CABECALHOS_SALDO, modelo_cabecalho)))
+    for linha in linhas:
+        ws.append(list(celulas(linha, modelo_linha)))
+
+def montar_planilha(c, turnos, inicio, fim, tarefa=None):
+    from openpyxl import Workbook
+    plano, larguras, totais = planejar(c, turnos, inicio, fim, tarefa)
+    wb = Workbook(write_only=True)
+    escrever_abas(wb, [(turno, larguras[turno], totais[turno], linhas_turno(c, turno, plano))
+                       for turno in turnos], tarefa)
+    return wb
+
+def intervalo_exportacao(c, inicio, fim):
+    # sem limites, vai do mês da primeira ao mês da última escala (meses
+    # inteiros aproveitam os fragmentos)
+    if inicio is None or fim is None:
+        menor, maior = c.execute("SELECT MIN(data), MAX(data) FROM escalas").fetchone()
+        if menor is None:
+            return None
+        inicio = inicio or intervalo_mes(int(menor[5:7]), int(menor[:4]))[0]
+        fim = fim or intervalo_mes(int(maior[5:7]), int(maior[:4]))[1]
+    return inicio, fim
+
+def turnos_do_intervalo(c, inicio, fim):
+    c.execute("""
+        SELECT DISTINCT turno FROM escalas WHERE data BETWEEN ? AND ? ORDER BY turno
+    """, (inicio.isoformat(), fim.isoformat()))
+    return [r[0] for r in c.fetchall()]
+
+@medir("exportar")
+def exportar_planilha(path, inicio=None, fim=None, saldo=False, tarefa=None):
+    # inicio/fim (date) limitam a exportação a um mês ou intervalo; saldo
+    # acrescenta a aba com o saldo de horas do mesmo período
+    c = conexao().cursor()
+    try:
+        intervalo = intervalo_exportacao(c, inicio, fim)
+        if intervalo is None:
+            raise ValueError("Não há escalas para exportar.")
+        inicio, fim = intervalo
+        turnos = turnos_do_intervalo(c, inicio, fim)
+        wb = montar_planilha(c, turnos, inicio, fim, tarefa)
+        if saldo:
+            with fase("saldo de horas"):
+                escrever_saldo(wb, saldo_horas(inicio, fim))
+        with fase("salvar (openpyxl)"):
+            wb.save(path)
+    finally:
+        c.close()
+
+def ha_escalas(inicio=None, fim=None):
+    if inicio is None or fim is None:
+        return conexao().execute("SELECT 1 FROM escalas LIMIT 1").fetchone() is not None
+    return conexao().execute(
+        "SELECT 1 FROM escalas WHERE data BETWEEN ? AND ? LIMIT 1",
+        (inicio.isoformat(), fim.isoformat())).fetchone() is not None
@@ -0,0 +1,89 @@
+import hashlib
+from datetime import date
+from functools import lru_cache
+
+from .db import conexao, transacao
+
+@lru_cache(maxsize=None)
+def _biblioteca():
+    # Tentar importar a biblioteca de feriados (só quando for usada)
+    try:
+        import holidays
+    except ImportError:
+        return None
+    return holidays
+
+# Feriados municipais de Palmas-TO (dia/mês)
+palmas_holidays = {
+    "20/05": "Aniversário de Palmas",
+    # adicione outros feriados municipais aqui...
+}
+
+# Estado (subdivisão do `holidays`) e tabela municipal em uso; cada
+# unidade configura os seus (escalas.unidades). Padrão: Palmas-TO.
+_config = {"subdivisao": "TO", "municipais": palmas_holidays}
+
+# Índice em memória: ano -> {date: nome}
+_por_ano = {}
+
+def configurar(subdivisao="TO", municipais=None):
+    if municipais is None:
+        municipais = palmas_holidays
+    if (subdivisao, municipais) != (_config["subdivisao"], _config["municipais"]):
+        _config["subdivisao"], _config["municipais"] = subdivisao, dict(municipais)
+        _por_ano.clear()
+
+def assinatura():
+    # muda quando a biblioteca, o estado ou a tabela municipal mudam,
+    # invalidando o cache gravado no banco
+    holidays = _biblioteca()
+    versao = holidays.__version__ if holidays else "-"
+    base = repr((versao, _config["subdivisao"], sorted(_config["municipais"].items())))
+    return hashlib.sha1(base.encode()).hexdigest()[:12]
+
+def _calcular_ano(ano):
+    holidays = _biblioteca()
+    # nacional/estadual
+    subdiv = _config["subdivisao"]
+    mapa = dict(holidays.Brazil(subdiv=subdiv, years=ano).items()) if holidays else {}
+    # municipal
+    for dia_mes, nome in _config["municipais"].items():
+        dia, mes = map(int, dia_mes.split("/"))
+        dt = date(ano, mes, dia)
+        mapa[dt] = f"{mapa[dt]}; {nome}" if dt in mapa else nome
+    return mapa
+
+def _ler_cache(ano, assinatura):
+    c = conexao().execute(
+        "SELECT data, nome FROM feriados WHERE ano = ? AND assinatura = ?",
+        (ano, assinatura))
+    return {date.fromisoformat(d): nome for d, nome in c}
+
+def _gravar_cache(ano, assinatura, mapa):
+    with transacao() as c:
+        c.execute("DELETE FROM feriados WHERE ano = ?", (ano,))
+        c.executemany(
+            "INSERT INTO feriados (ano, assinatura, data, nome) VALUES (?, ?, ?, ?)",
+            [(ano, assinatura, dt.isoformat(), nome) for dt, nome in mapa.items()])
+
+def feriados_do_ano(ano):
+    # {date: nome} com feriados nacionais, estaduais e municipais;
+    # memorizado no processo e gravado na tabela feriados do banco
+    mapa = _por_ano.get(ano)
+    if mapa is not None:
+        return mapa
+    atual = assinatura()
+    mapa = _ler_cache(ano, atual)
+    if not mapa:
+        mapa = _calcular_ano(ano)
+        # sem a biblioteca o ano fica incompleto: não vale gravar
+        if _biblioteca() is not None:
+            _gravar_cache(ano, atual, mapa)
+    _por_ano[ano] = mapa
+    return mapa
+
+def feriado_em(dt):
+    return feriados_do_ano(dt.year).get(dt, "")
+
+def limpar_cache():
+    _por_ano.clear()
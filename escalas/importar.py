@@ -0,0 +1,109 @@
+import csv
+import os
+from datetime import date, datetime
+
+from .datas import data_iso
+from .diagnostico import fase, medir
+from .escala import listar_funcionarios
+from .trocas import registrar_trocas
+
+# Planilha de trocas: colunas Original, Substituto e Data (DD/MM/AAAA).
+# Funcionários podem vir pelo id, por "id - nome" (como nas listas da
+# tela) ou pelo nome exato. A linha de cabeçalho é opcional.
+
+def _linhas_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        yield from csv.reader(f, dialeto)
+
+def _linhas_xlsx(path):
+    from openpyxl import load_workbook
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _data(valor):
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    texto = str(valor or "").strip()
+    try:
+        return data_iso(texto)
+    except ValueError:
+        return date.fromisoformat(texto).isoformat()
+
+def _funcionario(valor, por_nome):
+    if isinstance(valor, (int, float)) and int(valor) == valor:
+        return int(valor)
+    texto = str(valor or "").strip()
+    inicio = texto.split(" - ")[0].strip()
+    if inicio.isdigit():
+        return int(inicio)
+    ids = por_nome.get(texto.casefold())
+    if not ids:
+        raise ValueError(f"Funcionário não encontrado: {texto!r}.")
+    if len(ids) > 1:
+        raise ValueError(f"Há mais de um funcionário chamado {texto!r}; use o id.")
+    return ids[0]
+
+def _ler(path, colunas):
+    # linhas com `colunas` funcionários seguidos da data; devolve
+    # ([(linha, *ids, data ISO)], [(linha, erro)])
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        linhas = _linhas_xlsx(path)
+    else:
+        linhas = _linhas_csv(path)
+    por_nome = {}
+    for fid, nome, _ in listar_funcionarios():
+        por_nome.setdefault(nome.casefold(), []).append(fid)
+
+    lidas, erros = [], []
+    for n, valores in enumerate(linhas, start=1):
+        valores = list(valores or ())[:colunas + 1]
+        if not any(str(v).strip() for v in valores if v is not None):
+            continue
+        valores += [None] * (colunas + 1 - len(valores))
+        try:
+            dt = _data(valores[colunas])
+        except ValueError:
+            if n == 1:
+                continue  # cabeçalho
+            erros.append((n, f"Data inválida: {valores[colunas]!r}. Use DD/MM/AAAA."))
+            continue
+        try:
+            lidas.append((n, *(_funcionario(v, por_nome) for v in valores[:colunas]), dt))
+        except ValueError as e:
+            erros.append((n, str(e)))
+    return lidas, erros
+
+def ler_trocas(path):
+    # devolve ([(linha, id_orig, id_sub, data ISO)], [(linha, erro)])
+    return _ler(path, 2)
+
+def ler_pedidos(path):
+    # pedidos de substituição, colunas Original e Data; devolve
+    # ([(linha, id_orig, data ISO)], [(linha, erro)])
+    return _ler(path, 1)
+
+@medir("importar_trocas")
+def importar_trocas(path, tarefa=None):
+    # lê o arquivo e grava as trocas válidas numa transação só;
+    # devolve (gravadas, [(linha do arquivo, erro)])
+    if tarefa:
+        tarefa.progresso(0, 2, "Lendo arquivo...")
+    with fase("leitura do arquivo"):
+        trocas, erros = ler_trocas(path)
+    if tarefa:
+        tarefa.progresso(1, 2, f"Validando {len(trocas)} trocas...")
+    gravadas, erros_lote = registrar_trocas(t[1:] for t in trocas)
+    erros += [(trocas[i][0], erro) for i, erro in erros_lote]
+    erros.sort()
+    return gravadas, erros
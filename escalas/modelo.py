@@ -0,0 +1,131 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from .db import conexao
+from .diagnostico import fase
+
+# Escala compacta para trabalho em lote (exportação, cobertura,
+# relatórios): colunas paralelas em array, uma posição por linha de
+# escalas, ordenadas por (dia, nome). Os dias são ordinais (date.toordinal)
+# já calculados pelo SQLite, os turnos viram códigos de 1 byte e os nomes
+# ficam num dicionário por id: ~14 bytes por plantão, sem nenhum texto
+# por linha e sem converter datas em Python.
+ORIGINAL = 1        # escalas.original = 1: quem trabalha no dia
+SUBSTITUINDO = 2    # o funcionário cobre uma troca neste dia
+
+# julianday('0001-01-01') = 1721425.5, ordinal 1
+SQL_ESCALA = """
+    SELECT CAST(julianday(e.data) - 1721424.5 AS INTEGER),
+           e.funcionario_id, e.turno, e.original
+      FROM escalas e
+      JOIN funcionarios f ON e.funcionario_id = f.id
+     WHERE e.data BETWEEN ? AND ?
+     ORDER BY e.data, f.nome
+"""
+
+# as trocas são poucas: lidas à parte e cruzadas em Python, em vez de
+# duas subconsultas por linha de escalas
+SQL_TROCAS = """
+    SELECT CAST(julianday(data) - 1721424.5 AS INTEGER),
+           funcionario_original, funcionario_substituto
+      FROM trocas
+     WHERE data BETWEEN ? AND ?
+"""
+
+class EscalaCompacta:
+    def __init__(self):
+        self.dias = array("i")           # ordinal do dia
+        self.funcionarios = array("I")
+        self.turnos = array("B")         # código em nomes_turno
+        self.flags = array("B")          # ORIGINAL | SUBSTITUINDO
+        self.substitutos = array("I")    # quem cobriu a troca; 0 = ninguém
+        self.nomes_turno = []
+        self.codigos_turno = {}
+        self.nomes = {}                  # id -> nome
+
+    def __len__(self):
+        return len(self.dias)
+
+    def codigo_turno(self, turno):
+        codigo = self.codigos_turno.get(turno)
+        if codigo is None:
+            codigo = self.codigos_turno[turno] = len(self.nomes_turno)
+            self.nomes_turno.append(turno)
+        return codigo
+
+    def adicionar(self, linhas, trocas=()):
+        # linhas: (ordinal, funcionario, turno, original) em ordem de (dia,
+        # nome); trocas: (ordinal, original, substituto)
+        substituto_de, substituindo = {}, set()
+        for dia, orig, sub in trocas:
+            substituto_de[(dia, orig)] = sub
+            substituindo.add((dia, sub))
+        dias, funcionarios, turnos = self.dias, self.funcionarios, self.turnos
+        flags, substitutos, codigos = self.flags, self.substitutos, self.codigos_turno
+        for dia, fid, turno, original in linhas:
+            codigo = codigos.get(turno)
+            if codigo is None:
+                codigo = self.codigo_turno(turno)
+            dias.append(dia)
+            funcionarios.append(fid)
+            turnos.append(codigo)
+            if substituto_de or substituindo:
+                flags.append((ORIGINAL if original else 0)
+                             | (SUBSTITUINDO if (dia, fid) in substituindo else 0))
+                substitutos.append(0 if original else substituto_de.get((dia, fid), 0))
+            else:
+                flags.append(ORIGINAL if original else 0)
+                substitutos.append(0)
+
+    def posicoes(self, inicio=None, fim=None):
+        # range das linhas entre inicio e fim (date ou ordinal), por bisseção
+        a = 0 if inicio is None else bisect_left(self.dias, _ordinal(inicio))
+        b = len(self.dias) if fim is None else bisect_right(self.dias, _ordinal(fim))
+        return range(a, b)
+
+    def selecionar(self, inicio=None, fim=None, turno=None, funcionario=None, flags=0):
+        # posições das linhas que atendem a todos os filtros; flags exige
+        # os bits pedidos (ex.: ORIGINAL para quem de fato trabalha)
+        posicoes = self.posicoes(inicio, fim)
+        if turno is not None:
+            codigo = self.codigos_turno.get(turno)
+            if codigo is None:
+                return []
+            turnos = self.turnos
+            posicoes = [i for i in posicoes if turnos[i] == codigo]
+        if funcionario is not None:
+            funcionarios = self.funcionarios
+            posicoes = [i for i in posicoes if funcionarios[i] == funcionario]
+        if flags:
+            todas = self.flags
+            posicoes = [i for i in posicoes if todas[i] & flags == flags]
+        return posicoes
+
+    def meses(self):
+        # (ano, mês) -> range das linhas do mês
+        resultado = {}
+        i, n = 0, len(self.dias)
+        while i < n:
+            primeiro = date.fromordinal(self.dias[i])
+            proximo = date(primeiro.year + primeiro.month // 12, primeiro.month % 12 + 1, 1)
+            j = bisect_left(self.dias, proximo.toordinal(), i)
+            resultado[(primeiro.year, primeiro.month)] = range(i, j)
+            i = j
+        return resultado
+
+def _ordinal(dia):
+    return dia if isinstance(dia, int) else dia.toordinal()
+
+def carregar(inicio=None, fim=None, c=None):
+    # um SELECT para as escalas do intervalo (date; None = sem limite);
+    # trocas e nomes vêm em consultas pequenas à parte
+    c = c or conexao()
+    intervalo = ("0000-01-01" if inicio is None else inicio.isoformat(),
+                 "9999-12-31" if fim is None else fim.isoformat())
+    modelo = EscalaCompacta()
+    with fase("modelo compacto"):
+        trocas = c.execute(SQL_TROCAS, intervalo).fetchall()
+        modelo.adicionar(c.execute(SQL_ESCALA, intervalo), trocas)
+        modelo.nomes = dict(c.execute("SELECT id, nome FROM funcionarios"))
+    return modelo
@@ -0,0 +1,134 @@
+import csv
+import json
+from datetime import date
+
+from .db import conexao
+from .diagnostico import fase, medir
+from .feriados import feriados_do_ano
+
+# Saldo de horas por funcionário num intervalo. Tudo sai de GROUP BY no
+# banco (o Python só soma alguns grupos por funcionário):
+#   trabalhadas = plantões com original = 1 (inclui os que cobriu)
+#   cedidas     = plantões próprios passados a outro (original = 0)
+#   assumidas   = plantões de outros que cobriu (trocas como substituto)
+#   previstas   = trabalhadas - assumidas + cedidas; saldo = a diferença
+HORAS_TURNO = {"12h": 12, "12h noturno": 12, "6h": 6}
+
+CABECALHOS_SALDO = (
+    ["Funcionário", "Tipo"]
+    + [f"Plantões {turno}" for turno in HORAS_TURNO]
+    + ["Horas previstas", "Horas trabalhadas", "Saldo", "Trocas cedidas",
+       "Trocas assumidas", "Plantões em feriado", "Horas em feriado"]
+)
+
+# um grupo por (funcionário, turno, original); só lê o índice
+# idx_escalas_data_cobertura
+SQL_ESCALAS = """
+    SELECT funcionario_id, turno, original, COUNT(*)
+      FROM escalas
+     WHERE data BETWEEN ? AND ?
+     GROUP BY 1, 2, 3
+"""
+
+# plantões trabalhados em feriado: os dias do intervalo vão como um array
+# JSON (sem tabela temporária: o relatório não escreve no banco) e cada um
+# é uma busca no índice
+SQL_FERIADOS = """
+    SELECT e.funcionario_id, e.turno, COUNT(*)
+      FROM json_each(?) j
+      JOIN escalas e ON e.data = j.value AND e.original = 1
+     GROUP BY 1, 2
+"""
+
+# plantões cobertos em trocas, pelo turno de quem cobriu. O "+" impede o
+# SQLite de repetir o intervalo de t.data em e.data, o que trocava a busca
+# exata por (data, funcionário) por uma varredura do ano de cada um
+SQL_ASSUMIDAS = """
+    SELECT t.funcionario_substituto, e.turno, COUNT(*)
+      FROM trocas t
+      JOIN escalas e ON e.funcionario_id = t.funcionario_substituto
+                    AND e.data = +t.data AND e.original = 1
+     WHERE t.data BETWEEN ? AND ?
+     GROUP BY 1, 2
+"""
+
+SQL_CEDIDAS = """
+    SELECT funcionario_original, COUNT(*) FROM trocas
+     WHERE data BETWEEN ? AND ? GROUP BY 1
+"""
+
+def _feriados_json(inicio, fim):
+    return json.dumps(sorted(
+        dt.isoformat()
+        for ano in range(inicio.year, fim.year + 1)
+        for dt in feriados_do_ano(ano)
+        if inicio <= dt <= fim))
+
+@medir("saldo_horas")
+def saldo_horas(inicio, fim):
+    # [(id, nome, tipo, {turno: plantões}, previstas, trabalhadas, saldo,
+    #   trocas cedidas, trocas assumidas, plantões em feriado, horas em
+    #   feriado)] de todos os funcionários, em ordem de nome
+    with fase("feriados"):
+        feriados = _feriados_json(inicio, fim)
+    c = conexao().cursor()
+    try:
+        intervalo = (inicio.isoformat(), fim.isoformat())
+        with fase("agregação"):
+            escalas = c.execute(SQL_ESCALAS, intervalo).fetchall()
+            em_feriados = c.execute(SQL_FERIADOS, (feriados,)).fetchall()
+            assumidas = c.execute(SQL_ASSUMIDAS, intervalo).fetchall()
+            cedidas = dict(c.execute(SQL_CEDIDAS, intervalo))
+            funcionarios = c.execute(
+                "SELECT id, nome, tipo FROM funcionarios ORDER BY nome").fetchall()
+    finally:
+        c.close()
+
+    # por funcionário: [plantões por turno, trabalhadas, cedidas (h),
+    # plantões em feriado, horas em feriado]
+    totais = {}
+    for fid, turno, original, n in escalas:
+        t = totais.setdefault(fid, [{}, 0, 0, 0, 0])
+        horas = HORAS_TURNO.get(turno, 0) * n
+        if original:
+            t[0][turno] = t[0].get(turno, 0) + n
+            t[1] += horas
+        else:
+            t[2] += horas
+    for fid, turno, n in em_feriados:
+        t = totais.setdefault(fid, [{}, 0, 0, 0, 0])
+        t[3] += n
+        t[4] += HORAS_TURNO.get(turno, 0) * n
+    horas_assumidas, trocas_assumidas = {}, {}
+    for fid, turno, n in assumidas:
+        horas_assumidas[fid] = horas_assumidas.get(fid, 0) + HORAS_TURNO.get(turno, 0) * n
+        trocas_assumidas[fid] = trocas_assumidas.get(fid, 0) + n
+
+    resultado = []
+    for fid, nome, tipo in funcionarios:
+        por_turno, trabalhadas, horas_cedidas, em_feriado, horas_feriado = \
+            totais.get(fid, ({}, 0, 0, 0, 0))
+        saldo = horas_assumidas.get(fid, 0) - horas_cedidas
+        resultado.append((fid, nome, tipo, por_turno, trabalhadas - saldo, trabalhadas, saldo,
+                          cedidas.get(fid, 0), trocas_assumidas.get(fid, 0),
+                          em_feriado, horas_feriado))
+    return resultado
+
+def linhas_saldo(saldos):
+    # linhas planas, na ordem de CABECALHOS_SALDO
+    for _, nome, tipo, por_turno, *numeros in saldos:
+        yield [nome, tipo, *(por_turno.get(turno, 0) for turno in HORAS_TURNO), *numeros]
+
+def exportar_saldo_csv(path, inicio=None, fim=None, tarefa=None):
+    # sem limites, da primeira à última escala; ponto e vírgula: o Excel
+    # em português abre direto
+    if inicio is None or fim is None:
+        menor, maior = conexao().execute("SELECT MIN(data), MAX(data) FROM escalas").fetchone()
+        if menor is None:
+            raise ValueError("Não há escalas no período.")
+        inicio = inicio or date.fromisoformat(menor)
+        fim = fim or date.fromisoformat(maior)
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow(CABECALHOS_SALDO)
+        escritor.writerows(linhas_saldo(saldo_horas(inicio, fim)))
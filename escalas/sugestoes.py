@@ -0,0 +1,169 @@
+from datetime import date, timedelta
+
+from . import cobertura
+from .db import conexao
+from .diagnostico import medir
+from .trocas import TrocaInvalida
+
+# Sugestão de substitutos. A disponibilidade vem do índice de cobertura
+# (dias ocupados por funcionário, já em memória) e o quadro é agrupado por
+# tipo e turno; cada pedido custa uma contagem de trocas recentes e uma
+# passada pelos colegas do mesmo grupo, sem consultar escalas.
+
+# turnos que podem cobrir cada turno, do melhor para o pior
+COMPATIVEIS = {
+    "12h": ("12h", "12h noturno"),
+    "12h noturno": ("12h noturno", "12h"),
+    "6h": ("6h",),
+}
+
+# início e fim de cada turno, em horas a partir da meia-noite do dia
+HORARIOS = {"12h": (7, 19), "12h noturno": (19, 31), "6h": (7, 13)}
+
+# descanso mínimo entre dois plantões (interjornada). Quem é 12x36 tem
+# ainda a folga de 36 h: plantão no dia vizinho já é conflito
+DESCANSO_MINIMO = 11
+
+# trocas assumidas nos últimos dias contam contra o colega
+JANELA_DIAS = 90
+
+SQL_RECENTES = """
+    SELECT funcionario_substituto, COUNT(*) FROM trocas
+     WHERE data BETWEEN ? AND ? GROUP BY 1
+"""
+
+class _Quadro:
+    def __init__(self, c):
+        self.dados = {}    # id -> (nome, tipo, escala_dias, turno)
+        self.grupos = {}   # (tipo, turno) -> [id]
+        for fid, nome, tipo, escala_dias, turno in c.execute(
+                "SELECT id, nome, tipo, escala_dias, turno FROM funcionarios"):
+            self.dados[fid] = (nome, tipo, escala_dias, turno)
+            self.grupos.setdefault((tipo, turno), []).append(fid)
+
+def _recentes(c, dia):
+    inicio = dia - timedelta(days=JANELA_DIAS)
+    return dict(c.execute(SQL_RECENTES, (inicio.isoformat(), dia.isoformat())))
+
+def _vizinhos(turno_em, fid, tipo, turno, dia):
+    # quantos dos dias vizinhos o colega já trabalha (0 a 2), ou None se o
+    # plantão extra tirar a folga do 12x36 ou não deixar o descanso mínimo
+    # em relação a eles
+    inicio, fim = HORARIOS.get(turno, (0, 24))
+    trabalhados = 0
+    antes = turno_em(fid, dia - 1)
+    if antes is not None:
+        if tipo == "12x36":
+            return None
+        trabalhados += 1
+        if inicio - (HORARIOS.get(antes, (0, 24))[1] - 24) < DESCANSO_MINIMO:
+            return None
+    depois = turno_em(fid, dia + 1)
+    if depois is not None:
+        if tipo == "12x36":
+            return None
+        trabalhados += 1
+        if (HORARIOS.get(depois, (0, 24))[0] + 24) - fim < DESCANSO_MINIMO:
+            return None
+    return trabalhados
+
+def _candidatos(quadro, id_orig, dia, recentes, turno_em, extras):
+    # [(chave de ordenação, id)] dos colegas livres e descansados, do
+    # melhor para o pior: turno igual, menos dias vizinhos trabalhados,
+    # grupo oposto, menos trocas, nome
+    _, tipo, escala_dias, turno = quadro.dados[id_orig]
+    resultado = []
+    for ordem, c_turno in enumerate(COMPATIVEIS.get(turno, (turno,))):
+        for fid in quadro.grupos.get((tipo, c_turno), ()):
+            if fid == id_orig or turno_em(fid, dia) is not None:
+                continue
+            vizinhos = _vizinhos(turno_em, fid, tipo, c_turno, dia)
+            if vizinhos is None:
+                continue
+            nome, _, c_dias, _ = quadro.dados[fid]
+            # o grupo oposto (pares x ímpares) folga justamente neste dia
+            grupo = 0 if escala_dias and c_dias and c_dias != escala_dias else 1
+            trocas = recentes.get(fid, 0) + extras.get(fid, 0)
+            resultado.append(((ordem, vizinhos, grupo, trocas, nome.casefold(), fid), fid))
+    resultado.sort()
+    return resultado
+
+def _validar(c, quadro, id_orig, dia):
+    if id_orig not in quadro.dados:
+        raise TrocaInvalida("Funcionário não encontrado.")
+    if c.execute("SELECT 1 FROM trocas WHERE funcionario_original = ? AND data = ?",
+                 (id_orig, dia.isoformat())).fetchone():
+        raise TrocaInvalida("Já foi substituído neste dia.")
+    if not cobertura.ocupado(id_orig, dia):
+        raise TrocaInvalida("Funcionário não estava escalado neste dia.")
+
+def _turno_indice():
+    # turno_em(id, ordinal) -> turno trabalhado no dia ou None
+    ocupados = cobertura.indice().ocupados
+    return lambda fid, dia: ocupados.get(fid, {}).get(dia)
+
+@medir("sugerir_substitutos")
+def sugerir_substitutos(id_orig, data, limite=10):
+    # [(id, nome, turno, trocas recentes)] do melhor para o pior; data ISO
+    # ou date
+    dia = data if isinstance(data, date) else date.fromisoformat(data)
+    c = conexao()
+    quadro = _Quadro(c)
+    _validar(c, quadro, id_orig, dia)
+    candidatos = _candidatos(quadro, id_orig, dia.toordinal(), _recentes(c, dia),
+                             _turno_indice(), {})
+    return [(fid, quadro.dados[fid][0], quadro.dados[fid][3], chave[3])
+            for chave, fid in candidatos[:limite]]
+
+@medir("sugerir_lote")
+def sugerir_lote(pedidos):
+    # pedidos: [(id_orig, data ISO)], por exemplo as folgas de um mês.
+    # Os pedidos com menos opções escolhem primeiro; cada troca atribuída
+    # ocupa o colega no dia e conta como troca recente dele, o que espalha
+    # as demais. Devolve [(id_orig, data, id_sub ou None, erro ou None)] na
+    # ordem dos pedidos; as trocas sugeridas podem ir direto para
+    # registrar_trocas.
+    pedidos = list(pedidos)
+    c = conexao()
+    quadro = _Quadro(c)
+    base = _turno_indice()
+    mudados = {}   # (id, ordinal) -> turno (ou None, liberado) pelo lote
+
+    def turno_em(fid, dia):
+        if (fid, dia) in mudados:
+            return mudados[(fid, dia)]
+        return base(fid, dia)
+
+    resultado = [None] * len(pedidos)
+    recentes, extras = {}, {}
+    vistos, abertos = set(), []
+    for pos, (id_orig, data) in enumerate(pedidos):
+        dia = date.fromisoformat(data)
+        try:
+            _validar(c, quadro, id_orig, dia)
+            if (id_orig, data) in vistos:
+                raise TrocaInvalida("Já foi substituído neste dia.")
+        except TrocaInvalida as e:
+            resultado[pos] = (id_orig, data, None, str(e))
+            continue
+        vistos.add((id_orig, data))
+        if dia not in recentes:
+            recentes[dia] = _recentes(c, dia)
+        n = len(_candidatos(quadro, id_orig, dia.toordinal(), recentes[dia], turno_em, extras))
+        abertos.append((n, pos, dia))
+
+    # a ordem é fixada pelas opções iniciais; os candidatos de cada pedido
+    # são recalculados na sua vez, já com as atribuições anteriores
+    for _, pos, dia in sorted(abertos):
+        id_orig, data = pedidos[pos]
+        ordinal = dia.toordinal()
+        candidatos = _candidatos(quadro, id_orig, ordinal, recentes[dia], turno_em, extras)
+        if not candidatos:
+            resultado[pos] = (id_orig, data, None, "Nenhum substituto disponível.")
+            continue
+        id_sub = candidatos[0][1]
+        resultado[pos] = (id_orig, data, id_sub, None)
+        mudados[(id_sub, ordinal)] = quadro.dados[id_sub][3]
+        mudados[(id_orig, ordinal)] = None
+        extras[id_sub] = extras.get(id_sub, 0) + 1
+    return resultado
@@ -0,0 +1,32 @@
+import queue
+import threading
+
+class Cancelado(Exception):
+    pass
+
+class Tarefa:
+    # lado do worker: informa o progresso e descobre se foi cancelado
+    def __init__(self):
+        self._cancelar = threading.Event()
+        self._progresso = queue.Queue()
+
+    def progresso(self, feito, total, texto=""):
+        # ponto de cancelamento: as funções longas chamam com frequência
+        if self._cancelar.is_set():
+            raise Cancelado()
+        self._progresso.put((feito, total, texto))
+
+    def cancelar(self):
+        self._cancelar.set()
+
+    @property
+    def cancelada(self):
+        return self._cancelar.is_set()
+
+    def ultimo_progresso(self):
+        ultimo = None
+        while True:
+            try:
+                ultimo = self._progresso.get_nowait()
+            except queue.Empty:
+                return ultimo
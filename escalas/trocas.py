@@ -0,0 +1,189 @@
+from .alteracoes import escalas_alteradas
+from .cobertura import ocupado
+from .datas import data_exibicao
+from .db import conexao
+from .diagnostico import medir
+from .diario import operacao
+
+class TrocaInvalida(ValueError):
+    pass
+
+# um SELECT para o lote inteiro: já substituído, escala do original
+# no dia (id e flag), turno do substituto e a flag da escala dele no dia
+# (NULL sem escala, 0 se ele mesmo foi substituído)
+SQL_VALIDAR_LOTE = """
+    SELECT EXISTS (SELECT 1 FROM trocas t
+                    WHERE t.funcionario_original = l.orig AND t.data = l.data),
+           e.id, e.original, f.turno,
+           (SELECT MIN(es.original) FROM escalas es
+             WHERE es.funcionario_id = l.sub AND es.data = l.data)
+      FROM lote_trocas l
+      LEFT JOIN escalas e ON e.id = (SELECT id FROM escalas
+                                      WHERE funcionario_id = l.orig AND data = l.data)
+      LEFT JOIN funcionarios f ON f.id = l.sub
+     ORDER BY l.pos
+"""
+
+def _validar_lote(c, trocas):
+    # trocas: [(id_orig, id_sub, data ISO)]; aplica as regras na ordem do
+    # lote, como se cada troca fosse registrada depois da anterior
+    c.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS lote_trocas (
+            pos INTEGER PRIMARY KEY, orig INTEGER, sub INTEGER, data TEXT)
+    """)
+    c.execute("DELETE FROM lote_trocas")
+    c.executemany("INSERT INTO lote_trocas VALUES (?, ?, ?, ?)",
+                  ((i, *t) for i, t in enumerate(trocas)))
+    consulta = c.execute(SQL_VALIDAR_LOTE).fetchall()
+    c.execute("DELETE FROM lote_trocas")
+
+    trocados = set()
+    flags = {}   # (funcionario, data) -> original, para escalas mexidas no lote
+    validas, erros = [], []
+    for i, ((id_orig, id_sub, data), (ja_trocado, esc_id, flag, turno_sub, flag_sub)) \
+            in enumerate(zip(trocas, consulta)):
+        if (id_orig, data) in flags:
+            esc_id, flag = None, flags[(id_orig, data)]
+        if id_orig == id_sub:
+            erro = "Original e substituto devem ser diferentes."
+        elif ja_trocado or (id_orig, data) in trocados:
+            erro = "Já foi substituído neste dia."
+        elif flag is None:
+            erro = "Funcionário não estava escalado neste dia."
+        elif flag == 0:
+            erro = "Escala já não é original."
+        elif turno_sub is None:
+            erro = "Turno do substituto não encontrado."
+        elif flags.get((id_sub, data), flag_sub) == 0:
+            # a escala dele no dia já é de outro: o INSERT OR IGNORE do
+            # substituto seria descartado e ele ficaria como ausente
+            erro = "Substituto foi substituído neste dia."
+        elif _sub_ocupado(flags, id_sub, data):
+            erro = "Substituto já está escalado neste dia."
+        else:
+            erro = None
+        if erro:
+            erros.append((i, erro))
+            continue
+        trocados.add((id_orig, data))
+        flags[(id_orig, data)] = 0
+        if flag_sub is None:
+            flags.setdefault((id_sub, data), 1)
+        validas.append((id_orig, id_sub, data, esc_id, turno_sub))
+    return validas, erros
+
+def _sub_ocupado(flags, id_sub, data):
+    # o que o lote já mudou vale mais que o índice, que só vê o banco
+    if (id_sub, data) in flags:
+        return flags[(id_sub, data)] == 1
+    return ocupado(id_sub, data)
+
+def _aplicar_lote(c, validas):
+    # grava as trocas validadas; devolve os ids delas, na ordem
+    if validas:
+        datas = [v[2] for v in validas]
+        escalas_alteradas(min(datas), max(datas))
+    ids = []
+    for id_orig, id_sub, data, esc_id, turno_sub in validas:
+        c.execute("""
+            INSERT INTO trocas (data, funcionario_original, funcionario_substituto)
+            VALUES (?, ?, ?)
+        """, (data, id_orig, id_sub))
+        ids.append(c.lastrowid)
+        if esc_id is None:
+            # escala criada por uma troca anterior do mesmo lote
+            c.execute("""
+                UPDATE escalas SET original = 0
+                 WHERE id = (SELECT id FROM escalas WHERE funcionario_id = ? AND data = ?)
+            """, (id_orig, data))
+        else:
+            c.execute("UPDATE escalas SET original = 0 WHERE id = ?", (esc_id,))
+        c.execute("""
+            INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
+            VALUES (?, ?, ?, 1)
+        """, (id_sub, data, turno_sub))
+    return ids
+
+@medir("realizar_troca")
+def registrar_troca(id_orig, id_sub, data):
+    # data em ISO (YYYY-MM-DD); devolve o id da troca
+    with operacao(f"Troca {id_orig} -> {id_sub} em {data_exibicao(data)}") as c:
+        validas, erros = _validar_lote(c, [(id_orig, id_sub, data)])
+        if erros:
+            raise TrocaInvalida(erros[0][1])
+        return _aplicar_lote(c, validas)[0]
+
+@medir("registrar_trocas")
+def registrar_trocas(trocas):
+    # várias trocas de uma vez: valida o lote inteiro e grava as válidas
+    # numa única transação; devolve (gravadas, [(posição no lote, erro)])
+    trocas = list(trocas)
+    with operacao(f"{len(trocas)} trocas em lote") as c:
+        validas, erros = _validar_lote(c, trocas)
+        _aplicar_lote(c, validas)
+    return len(validas), erros
+
+@medir("editar_troca")
+def alterar_data_troca(troca_id, nova_data):
+    row = conexao().execute(
+        "SELECT data FROM trocas WHERE id = ?", (troca_id,)
+    ).fetchone()
+    if not row:
+        raise TrocaInvalida("Troca não encontrada.")
+    with operacao(f"Troca {troca_id}: de {data_exibicao(row[0])} para {data_exibicao(nova_data)}") as c:
+        # lida e conferida de novo dentro da transação: outro processo pode
+        # ter mexido na troca ou escalado o substituto desde a leitura acima
+        row = c.execute(
+            "SELECT funcionario_original, funcionario_substituto, data FROM trocas WHERE id = ?", (troca_id,)
+        ).fetchone()
+        if not row:
+            raise TrocaInvalida("Troca não encontrada.")
+        orig_id, sub_id, old_dt = row
+        if nova_data != old_dt and ocupado(sub_id, nova_data):
+            raise TrocaInvalida("Substituto já está escalado neste dia.")
+        escalas_alteradas(old_dt, old_dt)
+        escalas_alteradas(nova_data, nova_data)
+        c.execute("UPDATE trocas SET data = ? WHERE id = ?", (nova_data, troca_id))
+        c.execute("UPDATE escalas SET original = 1 WHERE funcionario_id = ? AND data = ?", (orig_id, old_dt))
+        c.execute("DELETE FROM escalas WHERE funcionario_id = ? AND data = ?", (sub_id, old_dt))
+        c.execute("UPDATE escalas SET original = 0 WHERE funcionario_id = ? AND data = ?", (orig_id, nova_data))
+        c.execute("""
+            INSERT OR IGNORE INTO escalas (funcionario_id, data, turno, original)
+            VALUES (?, ?, (SELECT turno FROM funcionarios WHERE id = ?), 1)
+        """, (sub_id, nova_data, sub_id))
+
+def listar_trocas():
+    return conexao().execute("""
+        SELECT t.id, fo.nome, fs.nome, t.data
+          FROM trocas t
+          JOIN funcionarios fo ON t.funcionario_original = fo.id
+          JOIN funcionarios fs ON t.funcionario_substituto = fs.id
+         ORDER BY t.data DESC
+    """).fetchall()
+
+def buscar_trocas(inicio=None, fim=None, termo="", limite=50, apos=None):
+    # uma página do histórico, da mais recente para a mais antiga;
+    # apos = (data, id) da última troca da página anterior
+    filtros, params = [], []
+    if inicio:
+        filtros.append("t.data >= ?")
+        params.append(inicio)
+    if fim:
+        filtros.append("t.data <= ?")
+        params.append(fim)
+    if apos:
+        filtros.append("(t.data, t.id) < (?, ?)")
+        params.extend(apos)
+    if termo:
+        filtros.append("(fo.nome LIKE ? OR fs.nome LIKE ?)")
+        params.extend([f"%{termo}%"] * 2)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    return conexao().execute(f"""
+        SELECT t.id, fo.nome, fs.nome, t.data
+          FROM trocas t
+          JOIN funcionarios fo ON t.funcionario_original = fo.id
+          JOIN funcionarios fs ON t.funcionario_substituto = fs.id
+          {where}
+         ORDER BY t.data DESC, t.id DESC
+         LIMIT ?
+    """, (*params, limite)).fetchall()
@@ -0,0 +1,199 @@
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import db, feriados
+from .diagnostico import medir
+from .escala import gerar_escalas, listar_para_escala, regenerar_mes
+from .exportar import (
+    escrever_abas,
+    exportar_planilha,
+    intervalo_exportacao,
+    linhas_turno,
+    planejar,
+    turnos_do_intervalo,
+)
+from .tarefas import Cancelado
+
+# Cada unidade tem o próprio banco e a própria configuração de feriados.
+# A lista fica em unidades.json (ou $ESCALAS_UNIDADES):
+#
+#   [{"nome": "Palmas", "banco": "escalas.db", "subdivisao": "TO",
+#     "municipais": {"20/05": "Aniversário de Palmas"}},
+#    {"nome": "Araguaína", "banco": "araguaina.db", "subdivisao": "TO",
+#     "municipais": {"14/11": "Aniversário de Araguaína"}}]
+#
+# Bancos relativos são resolvidos a partir da pasta do arquivo. Sem o
+# arquivo há uma unidade só: o banco configurado e os feriados de Palmas.
+CAMINHO_PADRAO = os.environ.get("ESCALAS_UNIDADES", "unidades.json")
+
+def carregar(caminho=None):
+    caminho = caminho or CAMINHO_PADRAO
+    if not os.path.exists(caminho):
+        return [{"nome": "Principal", "banco": db.caminho_db(), "subdivisao": "TO",
+                 "municipais": dict(feriados.palmas_holidays)}]
+    with open(caminho, encoding="utf-8") as f:
+        itens = json.load(f)
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    unidades, nomes, bancos = [], set(), set()
+    for item in itens:
+        try:
+            nome, banco = item["nome"].strip(), item["banco"]
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError(f"{caminho}: cada unidade precisa de \"nome\" e \"banco\".")
+        banco = os.path.normpath(os.path.join(pasta, banco))
+        if nome.casefold() in nomes:
+            raise ValueError(f"{caminho}: unidade repetida: {nome!r}.")
+        if banco in bancos:
+            raise ValueError(f"{caminho}: o banco {banco} aparece em mais de uma unidade.")
+        nomes.add(nome.casefold())
+        bancos.add(banco)
+        unidades.append({"nome": nome, "banco": banco,
+                         "subdivisao": item.get("subdivisao", "TO"),
+                         "municipais": item.get("municipais", {})})
+    if not unidades:
+        raise ValueError(f"{caminho}: nenhuma unidade cadastrada.")
+    return unidades
+
+def ativar(unidade):
+    # passa a usar o banco e os feriados da unidade neste processo
+    db.configurar(unidade["banco"])
+    feriados.configurar(unidade["subdivisao"], unidade["municipais"])
+    db.init_db()
+
+# --- trabalho de cada processo (funções de módulo: precisam ser picklable) ---
+
+def _gerar(unidade, inicio, fim, substituir):
+    ativar(unidade)
+    if substituir:
+        return regenerar_mes(inicio, fim)
+    return gerar_escalas(listar_para_escala(), inicio, fim)
+
+def _exportar(unidade, path, inicio, fim):
+    ativar(unidade)
+    c = db.conexao().cursor()
+    try:
+        if intervalo_exportacao(c, inicio, fim) is None:
+            return None
+    finally:
+        c.close()
+    exportar_planilha(path, inicio, fim)
+    return path
+
+# linhas gravadas por bloco nos arquivos temporários da planilha única
+LINHAS_POR_BLOCO = 5000
+
+def _partes(unidade, pasta, inicio, fim):
+    # [(turno, larguras, total, arquivo)] da unidade, para a planilha
+    # única. As linhas vão para um arquivo por turno em pasta, em blocos,
+    # e não voltam pela memória do processo principal
+    ativar(unidade)
+    c = db.conexao().cursor()
+    try:
+        intervalo = intervalo_exportacao(c, inicio, fim)
+        if intervalo is None:
+            return []
+        turnos = turnos_do_intervalo(c, *intervalo)
+        plano, larguras, totais = planejar(c, turnos, *intervalo)
+        resultado = []
+        for turno in turnos:
+            fd, arquivo = tempfile.mkstemp(suffix=".pkl", dir=pasta)
+            with os.fdopen(fd, "wb") as f:
+                bloco = []
+                for linha in linhas_turno(c, turno, plano):
+                    bloco.append(linha)
+                    if len(bloco) == LINHAS_POR_BLOCO:
+                        pickle.dump(bloco, f, pickle.HIGHEST_PROTOCOL)
+                        bloco = []
+                pickle.dump(bloco, f, pickle.HIGHEST_PROTOCOL)
+            resultado.append((turno, larguras[turno], totais[turno], arquivo))
+        return resultado
+    finally:
+        c.close()
+
+def _ler_blocos(arquivo):
+    with open(arquivo, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+def _em_paralelo(funcao, trabalhos, processos=None, tarefa=None, texto=""):
+    # trabalhos: [(unidade, args)]. Cada unidade roda num processo (spawn:
+    # nada da interface nem das conexões abertas vai junto). Devolve
+    # ({nome: resultado}, [(nome, erro)]); cancelar descarta as unidades
+    # que ainda não começaram.
+    processos = max(1, min(processos or os.cpu_count() or 1, len(trabalhos)))
+    contexto = multiprocessing.get_context("spawn")
+    resultados, erros = {}, []
+    pool = ProcessPoolExecutor(max_workers=processos, mp_context=contexto)
+    try:
+        futuros = {pool.submit(funcao, unidade, *args): unidade["nome"]
+                   for unidade, args in trabalhos}
+        pendentes = set(futuros)
+        while pendentes:
+            if tarefa:
+                feitas = len(trabalhos) - len(pendentes)
+                tarefa.progresso(feitas, len(trabalhos), f"{texto}: {feitas} de {len(trabalhos)} unidades")
+            prontos, pendentes = wait(pendentes, timeout=0.2, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                nome = futuros[futuro]
+                try:
+                    resultados[nome] = futuro.result()
+                except Exception as e:
+                    erros.append((nome, str(e)))
+    except Cancelado:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return resultados, erros
+
+@medir("gerar_unidades")
+def gerar_todas(unidades, inicio, fim, substituir=False, processos=None, tarefa=None):
+    # gera o intervalo em todas as unidades; devolve ({nome: plantões}, erros)
+    trabalhos = [(u, (inicio, fim, substituir)) for u in unidades]
+    return _em_paralelo(_gerar, trabalhos, processos, tarefa, "Gerando escalas")
+
+def nome_arquivo(unidade):
+    seguro = "".join(ch if ch.isalnum() or ch in " -_" else "_" for ch in unidade["nome"])
+    return f"escalas_{seguro.strip().replace(' ', '_')}.xlsx"
+
+@medir("exportar_unidades")
+def exportar_todas(unidades, pasta, inicio=None, fim=None, processos=None, tarefa=None):
+    # uma planilha por unidade em pasta, cada uma gravada no seu processo;
+    # devolve ({nome: caminho ou None se vazia}, erros)
+    os.makedirs(pasta, exist_ok=True)
+    trabalhos = [(u, (os.path.join(pasta, nome_arquivo(u)), inicio, fim)) for u in unidades]
+    return _em_paralelo(_exportar, trabalhos, processos, tarefa, "Exportando")
+
+def _titulo_aba(texto):
+    # o Excel não aceita estes caracteres no nome da aba
+    return "".join("_" if ch in "[]:*?/\\" else ch for ch in texto)
+
+@medir("exportar_unidades")
+def exportar_combinada(unidades, path, inicio=None, fim=None, processos=None, tarefa=None):
+    # uma planilha só, com uma aba "Unidade - turno". As consultas e a
+    # formatação rodam em paralelo; a gravação do openpyxl é uma só, aqui.
+    from openpyxl import Workbook
+    pasta = tempfile.mkdtemp(prefix="escalas-")
+    try:
+        trabalhos = [(u, (pasta, inicio, fim)) for u in unidades]
+        por_unidade, erros = _em_paralelo(_partes, trabalhos, processos, tarefa, "Preparando linhas")
+        abas = [(_titulo_aba(f"{u['nome']} - {turno}"), larguras, total, _ler_blocos(arquivo))
+                for u in unidades
+                for turno, larguras, total, arquivo in por_unidade.get(u["nome"], ())]
+        if not abas:
+            if erros:
+                return False, erros
+            raise ValueError("Não há escalas para exportar.")
+        wb = Workbook(write_only=True)
+        escrever_abas(wb, abas, tarefa)
+        wb.save(path)
+        return True, erros
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
@@ -0,0 +1,41 @@
+import tkinter as tk
+
+from escalas import diagnostico
+
+class JanelaDiagnostico:
+    # mostra as últimas operações medidas por escalas.diagnostico
+    def __init__(self, root):
+        self.top = tk.Toplevel(root)
+        self.top.title("Diagnóstico")
+        self.top.transient(root)
+
+        if diagnostico.ATIVO:
+            aviso = f"Registrando em {diagnostico.CAMINHO_LOG}"
+        else:
+            aviso = ("Diagnóstico desligado. Para ligar, abra o programa com a variável "
+                     "ESCALAS_DIAGNOSTICO=<arquivo de log>.")
+        tk.Label(self.top, text=aviso, anchor="w", justify="left", wraplength=560).grid(
+            row=0, column=0, columnspan=2, padx=10, pady=(10, 5), sticky="w")
+
+        self.texto = tk.Text(self.top, width=100, height=30, wrap="none")
+        self.texto.grid(row=1, column=0, padx=(10, 0), sticky="nsew")
+        barra = tk.Scrollbar(self.top, orient="vertical", command=self.texto.yview)
+        barra.grid(row=1, column=1, padx=(0, 10), sticky="ns")
+        self.texto.configure(yscrollcommand=barra.set)
+
+        tk.Button(self.top, text="Atualizar", command=self.atualizar).grid(
+            row=2, column=0, columnspan=2, pady=5)
+        self.top.grid_rowconfigure(1, weight=1)
+        self.top.grid_columnconfigure(0, weight=1)
+        self.atualizar()
+
+    def atualizar(self):
+        # mais recente primeiro
+        registros = diagnostico.recentes()[::-1]
+        self.texto.configure(state="normal")
+        self.texto.delete("1.0", tk.END)
+        if registros:
+            self.texto.insert(tk.END, "\n\n".join(diagnostico.formatar(r) for r in registros))
+        elif diagnostico.ATIVO:
+            self.texto.insert(tk.END, "Nenhuma operação medida ainda.")
+        self.texto.configure(state="disabled")
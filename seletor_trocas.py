@@ -0,0 +1,105 @@
+import tkinter as tk
+from tkinter import messagebox, ttk
+from datetime import date, timedelta
+
+from escalas import buscar_trocas, data_exibicao, data_iso
+
+class SeletorTrocas:
+    # janela de busca de trocas: filtra por período e nome e pagina o
+    # histórico direto no banco, sem carregar tudo num combobox
+    POR_PAGINA = 50
+
+    def __init__(self, root, ao_escolher):
+        self._ao_escolher = ao_escolher
+        self._paginas = [None]   # início (data, id) de cada página visitada
+        self._ultima = None
+
+        self.top = tk.Toplevel(root)
+        self.top.title("Selecionar Troca")
+        self.top.transient(root)
+
+        filtros = tk.Frame(self.top, padx=10, pady=5)
+        filtros.grid(row=0, column=0, sticky="ew")
+        tk.Label(filtros, text="De:").grid(row=0, column=0, sticky="w")
+        self.de_var = tk.StringVar(value=(date.today() - timedelta(days=90)).strftime("%d/%m/%Y"))
+        tk.Entry(filtros, textvariable=self.de_var, width=12).grid(row=0, column=1, padx=2)
+        tk.Label(filtros, text="Até:").grid(row=0, column=2, sticky="w")
+        self.ate_var = tk.StringVar()
+        tk.Entry(filtros, textvariable=self.ate_var, width=12).grid(row=0, column=3, padx=2)
+        tk.Label(filtros, text="Nome:").grid(row=1, column=0, sticky="w")
+        self.termo_var = tk.StringVar()
+        termo = tk.Entry(filtros, textvariable=self.termo_var, width=30)
+        termo.grid(row=1, column=1, columnspan=3, pady=2, sticky="w")
+        termo.bind("<Return>", lambda _: self.buscar())
+        tk.Button(filtros, text="Buscar", command=self.buscar).grid(row=0, column=4, rowspan=2, padx=5)
+
+        lista = tk.Frame(self.top, padx=10)
+        lista.grid(row=1, column=0, sticky="nsew")
+        self.tree = ttk.Treeview(lista, columns=("ID", "Original", "Substituto", "Data"),
+                                 show="headings", height=12)
+        for col, w in [("ID", 50), ("Original", 150), ("Substituto", 150), ("Data", 90)]:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=w, anchor="center")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.tree.bind("<Double-1>", lambda _: self.escolher())
+
+        botoes = tk.Frame(self.top, pady=5)
+        botoes.grid(row=2, column=0)
+        self.anterior = tk.Button(botoes, text="< Anterior", command=self.pagina_anterior)
+        self.anterior.grid(row=0, column=0, padx=2)
+        self.pagina_lbl = tk.Label(botoes, width=10)
+        self.pagina_lbl.grid(row=0, column=1)
+        self.proxima = tk.Button(botoes, text="Próxima >", command=self.pagina_seguinte)
+        self.proxima.grid(row=0, column=2, padx=2)
+        tk.Button(botoes, text="Selecionar", command=self.escolher).grid(row=0, column=3, padx=10)
+
+        self.top.grid_rowconfigure(1, weight=1)
+        self.top.grid_columnconfigure(0, weight=1)
+        lista.grid_rowconfigure(0, weight=1)
+        lista.grid_columnconfigure(0, weight=1)
+        self.buscar()
+
+    def _filtros(self):
+        de, ate = self.de_var.get().strip(), self.ate_var.get().strip()
+        return (data_iso(de) if de else None, data_iso(ate) if ate else None,
+                self.termo_var.get().strip())
+
+    def buscar(self):
+        self._paginas = [None]
+        self._carregar()
+
+    def pagina_seguinte(self):
+        if self._ultima:
+            self._paginas.append(self._ultima)
+            self._carregar()
+
+    def pagina_anterior(self):
+        if len(self._paginas) > 1:
+            self._paginas.pop()
+            self._carregar()
+
+    def _carregar(self):
+        try:
+            inicio, fim, termo = self._filtros()
+        except ValueError:
+            messagebox.showerror("Erro", "Formato de data inválido. Use DD/MM/AAAA.", parent=self.top)
+            return
+        # busca uma linha a mais só para saber se existe próxima página
+        linhas = buscar_trocas(inicio, fim, termo, self.POR_PAGINA + 1, self._paginas[-1])
+        tem_mais = len(linhas) > self.POR_PAGINA
+        linhas = linhas[:self.POR_PAGINA]
+        self.tree.delete(*self.tree.get_children())
+        for tid, orig, sub, dt in linhas:
+            self.tree.insert("", "end", iid=str(tid), values=(tid, orig, sub, data_exibicao(dt)))
+        self._ultima = (linhas[-1][3], linhas[-1][0]) if tem_mais else None
+        self.pagina_lbl.configure(text=f"Página {len(self._paginas)}")
+        self.anterior.configure(state="normal" if len(self._paginas) > 1 else "disabled")
+        self.proxima.configure(state="normal" if tem_mais else "disabled")
+
+    def escolher(self):
+        sel = self.tree.selection()
+        if not sel:
+            return
+        tid, orig, sub, dt = self.tree.item(sel[0])["values"]
+        self._ao_escolher(f"{tid} - {orig} → {sub} em {dt}")
+        self.top.destroy()
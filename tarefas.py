@@ -0,0 +1,87 @@
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+from escalas.tarefas import Cancelado, Tarefa
+
+class ExecutorTarefas:
+    # roda operações pesadas fora da thread do Tk; progresso e resultado
+    # voltam para a interface via root.after
+    INTERVALO_MS = 100
+
+    def __init__(self, root, max_workers=2):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="escalas")
+        self._em_andamento = 0
+
+    def executar(self, titulo, funcao, *args, ao_concluir=None, ao_falhar=None):
+        tarefa = Tarefa()
+        futuro = self._pool.submit(funcao, *args, tarefa=tarefa)
+        self._em_andamento += 1
+        janela = _JanelaProgresso(self.root, titulo, tarefa.cancelar)
+        self.root.after(self.INTERVALO_MS, self._acompanhar, tarefa, futuro, janela,
+                        ao_concluir, ao_falhar)
+        return tarefa
+
+    def _acompanhar(self, tarefa, futuro, janela, ao_concluir, ao_falhar):
+        ultimo = tarefa.ultimo_progresso()
+        if ultimo:
+            janela.atualizar(*ultimo)
+        if not futuro.done():
+            self.root.after(self.INTERVALO_MS, self._acompanhar, tarefa, futuro, janela,
+                            ao_concluir, ao_falhar)
+            return
+        janela.fechar()
+        self._em_andamento -= 1
+        erro = futuro.exception()
+        if isinstance(erro, Cancelado):
+            return
+        if erro is not None:
+            if ao_falhar:
+                ao_falhar(erro)
+        elif ao_concluir:
+            ao_concluir(futuro.result())
+
+    @property
+    def ocupado(self):
+        return self._em_andamento > 0
+
+    def encerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+class _JanelaProgresso:
+    def __init__(self, root, titulo, ao_cancelar):
+        self._ao_cancelar = ao_cancelar
+        self.top = tk.Toplevel(root)
+        self.top.title(titulo)
+        self.top.resizable(False, False)
+        self.top.transient(root)
+        self.top.protocol("WM_DELETE_WINDOW", self._cancelar)
+        self.texto = tk.Label(self.top, text=f"{titulo}...", width=40, anchor="w")
+        self.texto.grid(row=0, column=0, padx=10, pady=(10, 2), sticky="w")
+        self.barra = ttk.Progressbar(self.top, mode="indeterminate", length=300)
+        self.barra.grid(row=1, column=0, padx=10, pady=2)
+        self.barra.start(15)
+        self.botao = tk.Button(self.top, text="Cancelar", command=self._cancelar)
+        self.botao.grid(row=2, column=0, pady=(2, 10))
+        # modal: evita disparar outra operação enquanto esta roda
+        self.top.grab_set()
+
+    def atualizar(self, feito, total, texto):
+        if total:
+            if str(self.barra["mode"]) != "determinate":
+                self.barra.stop()
+                self.barra.configure(mode="determinate", maximum=total)
+            self.barra.configure(maximum=total, value=min(feito, total))
+        if texto:
+            self.texto.configure(text=texto)
+
+    def _cancelar(self):
+        self._ao_cancelar()
+        self.botao.configure(state="disabled")
+        self.texto.configure(text="Cancelando...")
+
+    def fechar(self):
+        self.barra.stop()
+        self.top.grab_release()
+        self.top.destroy()
@@ -0,0 +1,28 @@
+import pytest
+
+from escalas import cobertura, db
+from escalas.exportar import limpar_fragmentos
+
+# Rodar da raiz do repositório: python -m pytest
+
+@pytest.fixture
+def caminho(tmp_path):
+    # banco vazio num diretório temporário, ainda sem tabelas
+    anterior = db.caminho_db()
+    caminho = str(tmp_path / "escalas.db")
+    db.configurar(caminho)
+    yield caminho
+    db.fechar()
+    db.configurar(anterior)
+    cobertura.descartar()
+    limpar_fragmentos()
+
+@pytest.fixture
+def banco(caminho):
+    db.init_db()
+    return db.conexao()
+
+def estado(c):
+    # conteúdo das tabelas de dados, para comparar antes e depois
+    return {tabela: c.execute(f"SELECT * FROM {tabela} ORDER BY id").fetchall()
+            for tabela in ("funcionarios", "escalas", "trocas")}
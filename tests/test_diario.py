@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from escalas import cobertura, db
+from escalas.datas import intervalo_mes
+from escalas.diario import MANTER_OPERACOES, desfazer, operacao, ultima_operacao
+from escalas.escala import cadastrar_funcionario, excluir_funcionario, regenerar_incremental
+from escalas.trocas import alterar_data_troca, registrar_troca
+
+from conftest import estado
+
+@pytest.fixture
+def equipe(banco):
+    return [cadastrar_funcionario("Ana", "12x36", "pares", "12h", "03/2025"),
+            cadastrar_funcionario("Bruno", "12x36", "ímpares", "12h", "03/2025")]
+
+def test_sem_operacao(banco):
+    with pytest.raises(ValueError):
+        desfazer()
+
+def test_desfaz_cadastro(equipe, banco):
+    antes = estado(banco)
+    cadastrar_funcionario("Carla", "estagiario", None, "6h", "03/2025")
+    assert desfazer() == "Cadastro de Carla"
+    assert estado(banco) == antes
+
+def test_desfaz_troca(equipe, banco):
+    ana, bruno = equipe
+    antes = estado(banco)
+    registrar_troca(ana, bruno, "2025-03-04")
+    assert cobertura.ocupado(bruno, "2025-03-04")
+    desfazer()
+    assert estado(banco) == antes
+    # o índice de cobertura acompanha
+    assert not cobertura.ocupado(bruno, "2025-03-04")
+
+def test_desfaz_edicao_de_troca(equipe, banco):
+    ana, bruno = equipe
+    troca = registrar_troca(ana, bruno, "2025-03-04")
+    assert banco.execute("SELECT id FROM trocas").fetchall() == [(troca,)]
+    antes = estado(banco)
+    alterar_data_troca(troca, "2025-03-06")
+    desfazer()
+    assert estado(banco) == antes
+
+def test_desfaz_exclusao_com_mesmos_ids(equipe, banco):
+    ana, _ = equipe
+    antes = estado(banco)
+    excluir_funcionario(ana)
+    desfazer()
+    assert estado(banco) == antes
+
+def test_desfaz_atualizacao(equipe, banco):
+    ana, bruno = equipe
+    with db.transacao() as c:
+        c.execute("INSERT INTO trocas (data, funcionario_original, funcionario_substituto) "
+                  "VALUES ('2025-03-04', ?, ?)", (ana, bruno))
+        c.execute("DELETE FROM escalas WHERE funcionario_id = ? AND data = '2025-03-10'", (ana,))
+    antes = estado(banco)
+    assert regenerar_incremental(*intervalo_mes(3, 2025)) == (2, 0, 1)
+    desfazer()
+    assert estado(banco) == antes
+
+def test_desfeita_nao_volta(equipe, banco):
+    cadastrar_funcionario("Carla", "estagiario", None, "6h", "03/2025")
+    desfazer()
+    # a próxima é a operação anterior; o próprio desfazer não entra
+    assert ultima_operacao()[2] == "Cadastro de Bruno"
+
+def test_diario_guarda_a_versao_sobrescrita(equipe, banco):
+    # a mesma linha alterada duas vezes volta à versão mais antiga, e o
+    # diário do desfazer guarda a versão que ele apagou
+    ana, _ = equipe
+    with operacao("Renomear"):
+        banco.execute("UPDATE funcionarios SET nome = 'Ana Maria' WHERE id = ?", (ana,))
+        banco.execute("UPDATE funcionarios SET nome = 'Ana Maria Souza' WHERE id = ?", (ana,))
+    desfazer()
+    assert banco.execute("SELECT nome FROM funcionarios WHERE id = ?", (ana,)).fetchone() == ("Ana",)
+    op = banco.execute("SELECT MAX(id) FROM diario").fetchone()[0]
+    linhas = banco.execute("SELECT tabela, linha, antes FROM diario_linhas WHERE operacao = ? ORDER BY id",
+                           (op,)).fetchall()
+    assert [(t, l) for t, l, _ in linhas] == [("funcionarios", ana), ("funcionarios", ana)]
+    assert json.loads(linhas[0][2])[1] == "Ana Maria Souza"
+    assert linhas[1][2] is None
+
+def test_operacao_com_erro_nao_fica_no_diario(equipe, banco):
+    ana, _ = equipe
+    ultima = ultima_operacao()
+    with pytest.raises(RuntimeError):
+        with operacao("Falha"):
+            banco.execute("DELETE FROM escalas WHERE funcionario_id = ?", (ana,))
+            raise RuntimeError
+    assert ultima_operacao() == ultima
+
+def test_poda_as_mais_antigas(banco):
+    for i in range(MANTER_OPERACOES + 5):
+        with operacao(f"Operação {i}"):
+            pass
+    assert banco.execute("SELECT COUNT(*) FROM diario").fetchone()[0] == MANTER_OPERACOES
@@ -0,0 +1,54 @@
+import pytest
+from openpyxl import load_workbook
+
+from escalas import exportar
+from escalas.datas import intervalo_mes
+from escalas.escala import cadastrar_funcionario, regenerar_mes
+from escalas.trocas import registrar_troca
+
+@pytest.fixture
+def equipe(banco):
+    # janeiro a março de 2025 gerados
+    ids = [cadastrar_funcionario("Ana", "12x36", "pares", "12h", "01/2025"),
+           cadastrar_funcionario("Bruno", "12x36", "ímpares", "12h", "01/2025")]
+    for mes in (2, 3):
+        regenerar_mes(*intervalo_mes(mes, 2025))
+    return ids
+
+@pytest.fixture
+def lidos(monkeypatch):
+    # meses relidos do banco (início de cada modelo compacto carregado)
+    lidos = []
+    carregar = exportar.carregar_modelo
+    def contar(inicio, fim, c):
+        lidos.append(inicio.strftime("%Y-%m"))
+        return carregar(inicio, fim, c)
+    monkeypatch.setattr(exportar, "carregar_modelo", contar)
+    return lidos
+
+def _valores(path):
+    return {ws.title: [tuple(linha) for linha in ws.iter_rows(values_only=True)]
+            for ws in load_workbook(path).worksheets}
+
+def test_reexportar_so_rele_o_mes_alterado(equipe, lidos, tmp_path):
+    ana, bruno = equipe
+    exportar.exportar_planilha(tmp_path / "1.xlsx")
+    # as duas passadas usam o mesmo modelo de cada mês
+    assert lidos == ["2025-01", "2025-02", "2025-03"]
+    del lidos[:]
+    exportar.exportar_planilha(tmp_path / "2.xlsx")
+    assert lidos == []
+    registrar_troca(ana, bruno, "2025-02-04")
+    exportar.exportar_planilha(tmp_path / "3.xlsx")
+    assert lidos == ["2025-02"]
+    exportar.limpar_fragmentos()
+    exportar.exportar_planilha(tmp_path / "4.xlsx")
+    assert _valores(tmp_path / "3.xlsx") == _valores(tmp_path / "4.xlsx")
+    assert _valores(tmp_path / "1.xlsx") != _valores(tmp_path / "3.xlsx")
+
+def test_mes_cortado_lido_uma_vez(equipe, lidos, tmp_path):
+    inicio, fim = intervalo_mes(2, 2025)
+    exportar.exportar_planilha(tmp_path / "1.xlsx", inicio.replace(day=10), fim)
+    exportar.exportar_planilha(tmp_path / "2.xlsx", inicio.replace(day=10), fim)
+    # fora do cache, mas a segunda passada não relê
+    assert lidos == ["2025-02", "2025-02"]
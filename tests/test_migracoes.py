@@ -0,0 +1,94 @@
+import sqlite3
+
+import pytest
+
+from escalas import db
+
+# Banco no formato da primeira versão (calend.py sem migrações): datas
+# DD/MM/YYYY, sem índices e com linhas repetidas em escalas
+ESQUEMA_ORIGINAL = """
+    CREATE TABLE funcionarios (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL,
+        tipo TEXT NOT NULL CHECK(tipo IN ('12x36','estagiario')),
+        escala_dias TEXT CHECK(escala_dias IN ('pares','ímpares')),
+        turno TEXT CHECK(turno IN ('12h','12h noturno','6h'))
+    );
+    CREATE TABLE escalas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        funcionario_id INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        turno TEXT NOT NULL,
+        original BOOLEAN DEFAULT 1,
+        FOREIGN KEY(funcionario_id) REFERENCES funcionarios(id)
+    );
+    CREATE TABLE trocas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TEXT NOT NULL,
+        funcionario_original INTEGER NOT NULL,
+        funcionario_substituto INTEGER NOT NULL,
+        FOREIGN KEY(funcionario_original) REFERENCES funcionarios(id),
+        FOREIGN KEY(funcionario_substituto) REFERENCES funcionarios(id)
+    );
+"""
+
+@pytest.fixture
+def banco_original(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(ESQUEMA_ORIGINAL)
+    conn.executemany("INSERT INTO funcionarios (nome, tipo, escala_dias, turno) VALUES (?, ?, ?, ?)", [
+        ("Ana", "12x36", "pares", "12h"),
+        ("Bruno", "12x36", "ímpares", "12h"),
+        ("Carla", "estagiario", None, "6h"),
+    ])
+    conn.executemany("INSERT INTO escalas (funcionario_id, data, turno, original) VALUES (?, ?, ?, ?)", [
+        (1, "02/03/2025", "12h", 1),    # 1
+        (1, "04/03/2025", "12h", 1),    # 2
+        (1, "02/03/2025", "12h", 1),    # 3: repetida
+        (1, "04/03/2025", "12h", 0),    # 4: repetida, a cópia foi trocada
+        (2, "04/03/2025", "12h", 1),    # 5: substituto de Ana
+        (3, "03/03/2025", "6h", 1),     # 6
+        (3, "03/03/2025", "6h", 1),     # 7: repetida
+        (3, "03/03/2025", "6h", 1),     # 8: repetida
+    ])
+    conn.execute("INSERT INTO trocas (data, funcionario_original, funcionario_substituto) "
+                 "VALUES ('04/03/2025', 1, 2)")
+    conn.commit()
+    conn.close()
+    return caminho
+
+def test_migra_banco_original(banco_original):
+    db.init_db()
+    c = db.conexao()
+    assert c.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRACOES)
+    # datas em ISO; das repetidas fica a mais antiga, com original = 0 se
+    # alguma cópia foi trocada
+    assert c.execute("SELECT id, funcionario_id, data, turno, original FROM escalas ORDER BY id").fetchall() == [
+        (1, 1, "2025-03-02", "12h", 1),
+        (2, 1, "2025-03-04", "12h", 0),
+        (5, 2, "2025-03-04", "12h", 1),
+        (6, 3, "2025-03-03", "6h", 1),
+    ]
+    assert c.execute("SELECT data, funcionario_original, funcionario_substituto FROM trocas").fetchall() == [
+        ("2025-03-04", 1, 2),
+    ]
+    assert c.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+
+def test_indice_unico_depois_da_migracao(banco_original):
+    db.init_db()
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transacao() as c:
+            c.execute("INSERT INTO escalas (funcionario_id, data, turno) VALUES (1, '2025-03-02', '12h')")
+
+def test_migracao_roda_uma_vez(banco_original):
+    db.init_db()
+    c = db.conexao()
+    antes = c.execute("SELECT * FROM escalas ORDER BY id").fetchall()
+    db.init_db()
+    assert c.execute("SELECT * FROM escalas ORDER BY id").fetchall() == antes
+    assert c.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRACOES)
+
+def test_banco_novo_ja_no_formato_atual(banco):
+    nomes = {n for (n,) in banco.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ux_escalas_funcionario_data_turno", "idx_escalas_data_cobertura", "idx_trocas_data"} <= nomes
+    assert banco.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRACOES)
@@ -0,0 +1,91 @@
+import pytest
+
+from escalas import db
+from escalas.alteracoes import versoes
+from escalas.datas import intervalo_mes
+from escalas.escala import (
+    cadastrar_funcionario,
+    gerar_escalas,
+    listar_para_escala,
+    regenerar_incremental,
+)
+from escalas.trocas import registrar_troca
+
+from conftest import estado
+
+MARCO = intervalo_mes(3, 2025)
+
+@pytest.fixture
+def equipe(banco):
+    # dois plantonistas do mesmo turno em dias alternados e um estagiário,
+    # com março de 2025 gerado
+    return [cadastrar_funcionario("Ana", "12x36", "pares", "12h", "03/2025"),
+            cadastrar_funcionario("Bruno", "12x36", "ímpares", "12h", "03/2025"),
+            cadastrar_funcionario("Carla", "estagiario", None, "6h", "03/2025")]
+
+def test_sem_diferencas_nao_grava(equipe, banco):
+    antes = estado(banco)
+    versao = versoes(*MARCO)
+    operacoes = banco.execute("SELECT COUNT(*) FROM diario").fetchone()
+    assert regenerar_incremental(*MARCO) == (0, 0, 0)
+    assert estado(banco) == antes
+    # nem versão nova (os caches continuam valendo) nem operação no diário
+    assert versoes(*MARCO) == versao
+    assert banco.execute("SELECT COUNT(*) FROM diario").fetchone() == operacoes
+
+def test_troca_registrada_fica_como_esta(equipe, banco):
+    ana, bruno, _ = equipe
+    registrar_troca(ana, bruno, "2025-03-04")
+    antes = estado(banco)
+    assert regenerar_incremental(*MARCO) == (0, 0, 0)
+    assert estado(banco) == antes
+
+def test_reaplica_troca_gravada_fora_do_fluxo(equipe, banco):
+    # troca que chegou só na tabela trocas: o original sai, o substituto entra
+    ana, bruno, _ = equipe
+    with db.transacao() as c:
+        c.execute("INSERT INTO trocas (data, funcionario_original, funcionario_substituto) "
+                  "VALUES ('2025-03-04', ?, ?)", (ana, bruno))
+    assert regenerar_incremental(*MARCO) == (1, 0, 1)
+    assert banco.execute("""
+        SELECT funcionario_id, original FROM escalas WHERE data = '2025-03-04' AND turno = '12h'
+         ORDER BY funcionario_id
+    """).fetchall() == [(ana, 0), (bruno, 1)]
+
+def test_corrige_linhas_a_mais_e_a_menos(equipe, banco):
+    ana, bruno, carla = equipe
+    with db.transacao() as c:
+        c.execute("DELETE FROM escalas WHERE funcionario_id = ? AND data = '2025-03-10'", (ana,))
+        c.execute("INSERT INTO escalas (funcionario_id, data, turno) VALUES (?, '2025-03-10', '12h')", (bruno,))
+        c.execute("UPDATE escalas SET original = 0 WHERE funcionario_id = ? AND data = '2025-03-11'", (carla,))
+    assert regenerar_incremental(*MARCO) == (1, 1, 1)
+    assert banco.execute("""
+        SELECT funcionario_id, original FROM escalas WHERE data IN ('2025-03-10', '2025-03-11')
+         ORDER BY data, funcionario_id
+    """).fetchall() == [(ana, 1), (carla, 1), (bruno, 1), (carla, 1)]
+
+def test_so_mexe_no_intervalo(equipe, banco):
+    gerar_escalas(listar_para_escala(), *intervalo_mes(4, 2025))
+    with db.transacao() as c:
+        c.execute("DELETE FROM escalas WHERE data LIKE '2025-04-%'")
+    abril = banco.execute("SELECT COUNT(*) FROM escalas WHERE data LIKE '2025-04-%'").fetchone()
+    assert regenerar_incremental(*MARCO) == (0, 0, 0)
+    assert banco.execute("SELECT COUNT(*) FROM escalas WHERE data LIKE '2025-04-%'").fetchone() == abril
+
+def test_funcionario_excluido_sai_da_escala(equipe, banco):
+    ana, _, _ = equipe
+    with db.transacao() as c:
+        c.execute("DELETE FROM funcionarios WHERE id = ?", (ana,))
+    quantas = banco.execute("SELECT COUNT(*) FROM escalas WHERE funcionario_id = ?", (ana,)).fetchone()[0]
+    assert regenerar_incremental(*MARCO) == (0, quantas, 0)
+    assert banco.execute("SELECT COUNT(*) FROM escalas WHERE funcionario_id = ?", (ana,)).fetchone() == (0,)
+
+def test_mesmo_resultado_que_gerar_do_zero(equipe, banco):
+    # cadastrado com a escala de outro mês: a atualização completa março
+    novo = cadastrar_funcionario("Davi", "12x36", "pares", "12h noturno", "04/2025")
+    inseridas, _, _ = regenerar_incremental(*MARCO)
+    assert inseridas == 15   # dias pares de março
+    marco = "SELECT data, turno, original FROM escalas WHERE funcionario_id = ? AND data LIKE '2025-03-%' ORDER BY data"
+    completa = banco.execute(marco, (novo,)).fetchall()
+    outro = cadastrar_funcionario("Davi", "12x36", "pares", "12h noturno", "03/2025")
+    assert banco.execute(marco, (outro,)).fetchall() == completa
@@ -0,0 +1,50 @@
+import pytest
+
+from escalas.escala import cadastrar_funcionario
+from escalas.sugestoes import sugerir_lote, sugerir_substitutos
+from escalas.trocas import registrar_troca
+
+# 10/03/2025 é par: o grupo "pares" trabalha, o "ímpares" folga, mas
+# trabalha nos dias 9 e 11
+
+@pytest.fixture
+def equipe(banco):
+    nomes = [("Ana", "pares", "12h"), ("Bia", "pares", "12h"), ("Caio", "pares", "12h"),
+             ("Bruno", "ímpares", "12h"), ("Davi", "ímpares", "12h"), ("Eva", "ímpares", "12h"),
+             ("Gil", "ímpares", "12h noturno")]
+    return {nome: cadastrar_funcionario(nome, "12x36", dias, turno, "03/2025")
+            for nome, dias, turno in nomes}
+
+def _folgar(equipe, quem, cobre):
+    # tira o colega dos dois vizinhos do dia 10
+    for data in ("2025-03-09", "2025-03-11"):
+        registrar_troca(equipe[quem], equipe[cobre], data)
+
+def test_emendar_plantoes_e_conflito_no_12x36(equipe):
+    # o grupo oposto está livre no dia, mas trabalha no 9 e no 11
+    assert sugerir_substitutos(equipe["Ana"], "2025-03-10") == []
+
+def test_sugere_quem_ficou_descansado(equipe):
+    _folgar(equipe, "Davi", "Bia")
+    assert [s[0] for s in sugerir_substitutos(equipe["Ana"], "2025-03-10")] == [equipe["Davi"]]
+
+def test_menos_trocas_recentes_primeiro(equipe):
+    _folgar(equipe, "Davi", "Bia")
+    _folgar(equipe, "Eva", "Caio")
+    # Eva já cobriu alguém este mês
+    registrar_troca(equipe["Bia"], equipe["Eva"], "2025-03-04")
+    sugestoes = sugerir_substitutos(equipe["Ana"], "2025-03-10")
+    assert [(s[0], s[3]) for s in sugestoes] == [(equipe["Davi"], 0), (equipe["Eva"], 1)]
+
+def test_turno_igual_antes_do_compativel(equipe):
+    _folgar(equipe, "Davi", "Bia")
+    _folgar(equipe, "Gil", "Caio")
+    # Gil é noturno: só depois de quem faz o mesmo turno
+    sugestoes = sugerir_substitutos(equipe["Ana"], "2025-03-10")
+    assert [s[0] for s in sugestoes] == [equipe["Davi"], equipe["Gil"]]
+
+def test_lote_nao_repete_o_colega_no_dia(equipe):
+    _folgar(equipe, "Davi", "Bia")
+    _folgar(equipe, "Eva", "Caio")
+    resultado = sugerir_lote([(equipe["Ana"], "2025-03-10"), (equipe["Caio"], "2025-03-10")])
+    assert [r[2] for r in resultado] == [equipe["Davi"], equipe["Eva"]]
@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+from escalas import cobertura
+from escalas.alteracoes import SQL_INCREMENTAR
+from escalas.escala import cadastrar_funcionario
+from escalas.trocas import TrocaInvalida, alterar_data_troca, registrar_troca
+
+@pytest.fixture
+def equipe(banco):
+    return [cadastrar_funcionario("Ana", "12x36", "pares", "12h", "03/2025"),
+            cadastrar_funcionario("Bruno", "12x36", "ímpares", "12h", "03/2025")]
+
+def test_alterar_data_ve_escala_gravada_por_outro_processo(equipe, banco, caminho):
+    ana, bruno = equipe
+    troca = registrar_troca(ana, bruno, "2025-03-04")
+    cobertura.indice()
+    # outro processo escala Bruno no dia 6 depois que o índice foi montado
+    # (e avisa a versão do mês, como escalas_alteradas)
+    outra = sqlite3.connect(caminho)
+    outra.execute("INSERT INTO escalas (funcionario_id, data, turno) VALUES (?, '2025-03-06', '12h')", (bruno,))
+    outra.execute(SQL_INCREMENTAR, ("2025-03",))
+    outra.commit()
+    outra.close()
+    with pytest.raises(TrocaInvalida):
+        alterar_data_troca(troca, "2025-03-06")
+    assert banco.execute("SELECT data FROM trocas WHERE id = ?", (troca,)).fetchone() == ("2025-03-04",)
+
+def test_alterar_data_de_troca_inexistente(banco):
+    with pytest.raises(TrocaInvalida):
+        alterar_data_troca(1, "2025-03-06")